@@ -3,41 +3,102 @@
 """
 
 import asyncio
-import json
 import logging
+import queue
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import duckdb
+import msgspec
+import orjson
 import redis.asyncio as redis
 
 from .settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Кодеки для бинарного формата событий (msgpack компактнее и быстрее JSON)
+_MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+_MSGPACK_DECODER = msgspec.msgpack.Decoder()
+
+
+def _encode_event(event: Dict[str, Any]) -> bytes:
+    """Кодирует событие согласно настроенному кодеку (msgpack или JSON)."""
+    if settings.event_codec == "msgpack":
+        return _MSGPACK_ENCODER.encode(event)
+    return orjson.dumps(event, option=orjson.OPT_NAIVE_UTC)
+
+
+def _decode_event(data: bytes) -> Dict[str, Any]:
+    """Декодирует событие согласно настроенному кодеку (msgpack или JSON)."""
+    if settings.event_codec == "msgpack":
+        return _MSGPACK_DECODER.decode(data)
+    return orjson.loads(data)
+
 
 class RedisAdapter:
     """Адаптер для Redis Pub/Sub."""
 
+    # Интервал накопления событий перед отправкой одним pipeline
+    _FLUSH_INTERVAL = 0.005
+
+    # Период фоновой проверки соединения: хэндлеры читают .connected
+    # как обычный bool, без ping на каждый запрос
+    _HEALTH_CHECK_INTERVAL = 5.0
+
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
         self.pubsub: Optional[redis.client.PubSub] = None
+        self.connection_pool: Optional[redis.BlockingConnectionPool] = None
         self.connected = False
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
 
     async def connect(self) -> bool:
-        """Подключение к Redis."""
+        """Подключение к Redis (идемпотентно).
+
+        Повторный вызов на живом соединении ничего не пересоздает:
+        /api/test-redis дергает connect на каждый запрос, и без
+        защиты каждый вызов плодил бы новый пул и фоновые задачи,
+        а старый flush навсегда зависал на брошенной очереди.
+        """
+        if self.connected and self.redis_client is not None:
+            return True
+
+        # Остатки предыдущей (неудачной) попытки гасим перед пересозданием
+        if self.redis_client is not None or self.connection_pool is not None:
+            await self.disconnect()
+
         try:
-            self.redis_client = redis.Redis(
+            # Пул соединений: параллельные публикации не упираются в одно
+            # соединение, а при исчерпании пула команда ждёт, а не падает
+            self.connection_pool = redis.BlockingConnectionPool(
                 host=settings.redis_host,
                 port=settings.redis_port,
                 db=settings.redis_db,
                 password=settings.redis_password or None,
-                decode_responses=True,
+                max_connections=settings.redis_max_connections,
+                # Проверяем простаивающие соединения, чтобы не отдать
+                # публикацию в мертвый сокет
+                health_check_interval=30,
+                # Работаем с bytes: orjson кодирует/декодирует без
+                # дополнительной UTF-8 конвертации
+                decode_responses=False,
             )
+            self.redis_client = redis.Redis(connection_pool=self.connection_pool)
 
             # Проверяем подключение
             await self.redis_client.ping()
             self.connected = True
+
+            # Фоновая задача собирает события и отправляет их одним pipeline
+            self._event_queue = asyncio.Queue()
+            self._flush_task = asyncio.create_task(self._flush_events_loop())
+
+            # Фоновая проверка живости обновляет self.connected
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
             logger.info("[SUCCESS] Redis подключен успешно")
             return True
 
@@ -48,13 +109,26 @@ class RedisAdapter:
 
     async def disconnect(self):
         """Отключение от Redis."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+
         if self.redis_client:
             await self.redis_client.close()
+            self.redis_client = None
             self.connected = False
             logger.info("Redis отключен")
 
+        if self.connection_pool:
+            await self.connection_pool.disconnect()
+            self.connection_pool = None
+
     async def publish_event(self, event_type: str, data: Dict[str, Any]) -> bool:
-        """Публикация события в Redis."""
+        """Публикация события в Redis (через очередь с батчингом)."""
         if not self.connected or not self.redis_client:
             return False
 
@@ -62,18 +136,130 @@ class RedisAdapter:
             event = {
                 "type": event_type,
                 "data": data,
-                "timestamp": datetime.now().isoformat(),
+                # isoformat() в Python не нужен: кодек форматирует datetime в C
+                "timestamp": datetime.now(),
             }
 
-            await self.redis_client.publish(settings.redis_channel, json.dumps(event))
+            self._event_queue.put_nowait(_encode_event(event))
             return True
 
         except Exception as e:
             logger.error(f"Ошибка публикации события: {e}")
             return False
 
-    async def subscribe_to_events(self, callback):
-        """Подписка на события из Redis."""
+    async def cache_get(self, key: str) -> Optional[bytes]:
+        """Читает значение из кэша ответов; None при промахе или ошибке."""
+        if not self.connected or not self.redis_client:
+            return None
+
+        try:
+            return await self.redis_client.get(key)
+        except Exception as e:
+            logger.error(f"Ошибка чтения кэша {key}: {e}")
+            return None
+
+    async def cache_set(self, key: str, value: bytes, ttl: int) -> bool:
+        """Сохраняет значение в кэш ответов с TTL в секундах."""
+        if not self.connected or not self.redis_client:
+            return False
+
+        try:
+            await self.redis_client.set(key, value, ex=ttl)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша {key}: {e}")
+            return False
+
+    def encode_event(self, event: Dict[str, Any]) -> bytes:
+        """Кодирует событие настроенным кодеком (для publish_raw)."""
+        return _encode_event(event)
+
+    async def publish_raw(self, payload: bytes) -> bool:
+        """Публикация заранее закодированного события.
+
+        Статичные события (управляющие команды, тестовые сообщения)
+        кодируются один раз, а не на каждый вызов.
+        """
+        if not self.connected or not self.redis_client:
+            return False
+
+        try:
+            self._event_queue.put_nowait(payload)
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка публикации события: {e}")
+            return False
+
+    async def publish_events_batch(self, events: List[Dict[str, Any]]) -> bool:
+        """Публикация пачки событий одним pipeline (один round-trip)."""
+        if not self.connected or not self.redis_client:
+            return False
+
+        try:
+            await self._publish_payloads([_encode_event(e) for e in events])
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка пакетной публикации событий: {e}")
+            return False
+
+    async def _publish_payloads(self, payloads: List[bytes]):
+        """Отправляет закодированные события одним pipeline."""
+        if len(payloads) == 1:
+            await self.redis_client.publish(settings.redis_channel, payloads[0])
+            return
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                pipe.publish(settings.redis_channel, payload)
+            await pipe.execute()
+
+    async def _flush_events_loop(self):
+        """Фоновая задача: копит события и отправляет их пачками."""
+        try:
+            while True:
+                # Ждём первое событие, затем даём очереди накопиться
+                payloads = [await self._event_queue.get()]
+                await asyncio.sleep(self._FLUSH_INTERVAL)
+
+                while not self._event_queue.empty():
+                    payloads.append(self._event_queue.get_nowait())
+
+                try:
+                    await self._publish_payloads(payloads)
+                except Exception as e:
+                    logger.error(f"Ошибка отправки событий: {e}")
+
+        except asyncio.CancelledError:
+            pass
+
+    async def _health_check_loop(self):
+        """Фоновая задача: поддерживает self.connected актуальным."""
+        try:
+            while True:
+                await asyncio.sleep(self._HEALTH_CHECK_INTERVAL)
+                try:
+                    await self.redis_client.ping()
+                    if not self.connected:
+                        logger.info("[SUCCESS] Redis снова доступен")
+                    self.connected = True
+                except Exception as e:
+                    if self.connected:
+                        logger.warning(f"[WARNING] Redis недоступен: {e}")
+                    self.connected = False
+
+        except asyncio.CancelledError:
+            pass
+
+    async def subscribe_to_events(self, callback, raw_callback=None):
+        """Подписка на события из Redis.
+
+        Args:
+            callback: Обработчик декодированных событий (dict)
+            raw_callback: Обработчик сырых байтов; если задан,
+                декодирование пропускается и payload передается как есть
+        """
         if not self.connected or not self.redis_client:
             return False
 
@@ -86,10 +272,17 @@ class RedisAdapter:
                     if self.pubsub:  # Проверяем, что pubsub не None
                         async for message in self.pubsub.listen():
                             if message["type"] == "message":
+                                if raw_callback is not None:
+                                    # Пропускаем decode+encode для транзита
+                                    await raw_callback(message["data"])
+                                    continue
                                 try:
-                                    event = json.loads(message["data"])
+                                    event = _decode_event(message["data"])
                                     await callback(event)
-                                except json.JSONDecodeError as e:
+                                except (
+                                    orjson.JSONDecodeError,
+                                    msgspec.DecodeError,
+                                ) as e:
                                     logger.error(f"Ошибка парсинга события: {e}")
                 except Exception as e:
                     logger.error(f"Ошибка в Redis listener: {e}")
@@ -105,12 +298,59 @@ class RedisAdapter:
 class DuckDBAdapter:
     """Адаптер для DuckDB (чтение снапшотов)."""
 
+    # Запрос готовится один раз: явный список колонок вместо SELECT *
+    # и неизменный текст, чтобы DuckDB переиспользовал план запроса
+    _POP_SNAPSHOTS_SQL = """
+        SELECT id, timestamp, population_size, avg_fitness, max_fitness
+        FROM population_snapshots
+        ORDER BY timestamp DESC
+        LIMIT ?
+    """
+
+    # Страница снапшотов по курсору: WHERE id > ? ограничивает объем
+    # ответа независимо от размера таблицы
+    _POP_SNAPSHOTS_PAGE_SQL = """
+        SELECT id, timestamp, population_size, avg_fitness, max_fitness
+        FROM population_snapshots
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """
+
+    # Агрегаты по поколениям поддерживаются инкрементально при записи
+    # снапшотов, поэтому /api/stats читает одну готовую строку
+    _ROLLUP_DDL = """
+        CREATE TABLE IF NOT EXISTS population_rollup (
+            generation INTEGER PRIMARY KEY,
+            size INTEGER,
+            avg_fitness DOUBLE,
+            max_fitness DOUBLE,
+            min_fitness DOUBLE,
+            avg_nodes DOUBLE,
+            avg_connections DOUBLE,
+            ts TIMESTAMP
+        )
+    """
+
+    _LATEST_STATS_SQL = """
+        SELECT generation, size, avg_fitness, max_fitness, min_fitness,
+               avg_nodes, avg_connections, ts
+        FROM population_rollup
+        ORDER BY generation DESC
+        LIMIT 1
+    """
+
     def __init__(self):
         # Проверяем, что DATA_DIR не None
         if settings.DATA_DIR is None:
             raise ValueError("DATA_DIR не настроен в settings")
         self.db_path = settings.DATA_DIR / "brainzzz.duckdb"
+        self.connection: Optional[duckdb.DuckDBPyConnection] = None
         self.connected = False
+        # Пул курсоров: курсор DuckDB — это отдельное соединение к той же
+        # базе, поэтому параллельные запросы не сериализуются на одном.
+        # queue.Queue потокобезопасен — запросы выполняются в thread pool
+        self._pool: queue.Queue = queue.Queue()
 
     def connect(self) -> bool:
         """Подключение к DuckDB."""
@@ -138,6 +378,14 @@ class DuckDBAdapter:
                 self.connection = duckdb.connect(str(self.db_path))
                 logger.info("[SUCCESS] DuckDB подключен к существующей базе")
 
+            # Таблица агрегатов для быстрого чтения статистики
+            self.connection.execute(self._ROLLUP_DDL)
+
+            # Наполняем пул заранее: создание курсора при запросе не на
+            # горячем пути, а параллельные запросы получают свой курсор
+            for _ in range(settings.duckdb_pool_size):
+                self._pool.put(self.connection.cursor())
+
             self.connected = True
             return True
 
@@ -148,44 +396,79 @@ class DuckDBAdapter:
 
     def disconnect(self):
         """Отключение от DuckDB."""
-        if hasattr(self, "connection") and self.connection:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+        if self.connection is not None:
             self.connection.close()
+            self.connection = None
             self.connected = False
             logger.info("DuckDB отключен")
 
     def get_population_snapshots(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Получает снапшоты популяции из DuckDB."""
-        if not self.connected:
+        if not self.connected or self.connection is None:
             return []
 
         try:
-            # Простой запрос для получения данных
-            query = """
-                SELECT * FROM population_snapshots
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """
-            result = self.connection.execute(query, [limit]).fetchall()
-
-            # Преобразуем в список словарей
-            snapshots = []
-            for row in result:
-                snapshots.append(
-                    {
-                        "id": row[0],
-                        "timestamp": row[1],
-                        "population_size": row[2],
-                        "avg_fitness": row[3],
-                        "max_fitness": row[4],
-                    }
-                )
-
-            return snapshots
+            # Берем курсор из пула вместо создания на каждый вызов
+            cursor = self._pool.get()
+            try:
+                # Arrow материализует колонки в C, без построения
+                # кортежей и словарей по одной строке в Python
+                table = cursor.execute(
+                    self._POP_SNAPSHOTS_SQL, [limit]
+                ).fetch_arrow_table()
+            finally:
+                self._pool.put(cursor)
+
+            return table.to_pylist()
 
         except Exception as e:
             logger.error(f"Ошибка получения снапшотов: {e}")
             return []
 
+    def get_population_snapshots_page(
+        self, after_id: int = 0, page_size: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Возвращает страницу снапшотов после заданного id (курсор)."""
+        if not self.connected or self.connection is None:
+            return []
+
+        try:
+            cursor = self._pool.get()
+            try:
+                table = cursor.execute(
+                    self._POP_SNAPSHOTS_PAGE_SQL, [after_id, page_size]
+                ).fetch_arrow_table()
+            finally:
+                self._pool.put(cursor)
+
+            return table.to_pylist()
+
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы снапшотов: {e}")
+            return []
+
+    def get_latest_stats(self) -> Optional[Dict[str, Any]]:
+        """Возвращает агрегаты последнего поколения из population_rollup."""
+        if not self.connected or self.connection is None:
+            return None
+
+        try:
+            cursor = self._pool.get()
+            try:
+                rows = cursor.execute(self._LATEST_STATS_SQL).fetch_arrow_table()
+            finally:
+                self._pool.put(cursor)
+
+            stats = rows.to_pylist()
+            return stats[0] if stats else None
+
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики: {e}")
+            return None
+
     def __repr__(self):
         return f"DuckDBAdapter(connected={self.connected})"
 
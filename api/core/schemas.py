@@ -13,11 +13,26 @@ class MessageType(str, Enum):
     """Типы WebSocket сообщений."""
 
     POPULATION_UPDATE = "population_update"
+    # Инкрементальное обновление: только изменившиеся/удаленные мозги
+    POPULATION_DELTA = "population_delta"
     BRAIN_UPDATE = "brain_update"
     TASK_UPDATE = "task_update"
     EVOLUTION_STEP = "evolution_step"
     SYSTEM_STATUS = "system_status"
     ERROR = "error"
+    # Конверт для пачки событий, сколлапсированных в один кадр
+    BATCH = "batch"
+
+
+class EvolveRequest(BaseModel):
+    """Параметры запуска эволюции.
+
+    Валидация выполняется pydantic-core (Rust) вместо ручных проверок
+    в handler'е; некорректное тело дает автоматический 422.
+    """
+
+    mutation_rate: float = Field(0.3, ge=0.0, le=1.0)
+    population_size: int = Field(20, ge=1, le=1000)
 
 
 class BrainStats(BaseModel):
@@ -19,13 +19,32 @@ class Settings(BaseSettings):
     redis_port: int = 6379
     redis_db: int = 0
     redis_password: str = ""
+    redis_max_connections: int = 32
     redis_channel: str = "brainzzz.events"
+    # Формат сериализации событий: "json" (совместимость) или "msgpack"
+    event_codec: str = "json"
+
+    # DuckDB: размер пула курсоров для параллельных аналитических запросов
+    duckdb_pool_size: int = 4
 
     # WebSocket
     ws_ping_interval: int = 20
     ws_ping_timeout: int = 20
     ws_max_connections: int = 100  # Нормальное значение для продакшена
     ws_connection_timeout: int = 30
+    # Транзит событий из Redis в WebSocket без декодирования.
+    # Внимание: клиенты получают формат события Redis, а не WebSocketMessage
+    ws_raw_passthrough: bool = False
+    # Формат broadcast-кадров: "json" (совместимость) или "msgpack".
+    # Приветственное сообщение всегда уходит в JSON, чтобы клиент мог
+    # договориться о формате до переключения
+    ws_codec: str = "json"
+    # Сжатие крупных broadcast-кадров zstd. Меняет формат кадра:
+    # первый байт — "Z" (сжатый) или "R" (как есть), клиент ветвится по нему
+    ws_zstd: bool = False
+    # Обновления популяции дельтами (population_delta) вместо полных
+    # снимков. Требует клиента, понимающего этот тип сообщений
+    ws_population_deltas: bool = False
 
     # API
     api_host: str = "127.0.0.1"  # Безопасный localhost вместо 0.0.0.0
@@ -55,10 +74,16 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 LOGS_DIR = PROJECT_ROOT / "logs"
 
-# Создаем директории если их нет
-DATA_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
-
 # Добавляем пути в настройки
 settings.DATA_DIR = DATA_DIR
 settings.LOGS_DIR = LOGS_DIR
+
+
+def ensure_dirs():
+    """Создает директории данных и логов.
+
+    Вызывается один раз на старте приложения, а не при каждом импорте
+    модуля (важно для multi-worker запуска и read-only контейнеров).
+    """
+    DATA_DIR.mkdir(exist_ok=True)
+    LOGS_DIR.mkdir(exist_ok=True)
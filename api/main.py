@@ -3,13 +3,19 @@
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Optional
-
-from core.adapters import redis_adapter
-from core.settings import settings
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import orjson
+from core.adapters import duckdb_adapter, redis_adapter
+from core.schemas import EvolveRequest
+from core.settings import ensure_dirs, settings
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from ws.hub import WebSocketHub
 
 # Настройка логирования
@@ -21,6 +27,8 @@ app = FastAPI(
     title="🧠 Brainzzz API",
     description="API для управления симуляцией эволюции нейронных сетей",
     version="1.0.0",
+    # Все ответы сериализуются через orjson (C-кодек)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -36,6 +44,21 @@ app.add_middleware(
 websocket_hub = WebSocketHub()
 
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Единый обработчик необработанных ошибок.
+
+    Заменяет try/except Exception в каждом handler'е: happy path не несет
+    лишних блоков, а детали ошибки не утекают клиенту.
+    """
+    logger.error(
+        "Необработанная ошибка %s %s: %s", request.method, request.url.path, exc
+    )
+    return ORJSONResponse(
+        status_code=500, content={"detail": "Внутренняя ошибка сервера"}
+    )
+
+
 # Startup и shutdown события
 @app.on_event("startup")
 async def startup_event():
@@ -43,6 +66,12 @@ async def startup_event():
     logger.info("[STARTUP] Brainzzz API запускается...")
     logger.info(f"WebSocket лимит соединений: {websocket_hub.max_connections}")
 
+    # Создаем рабочие директории один раз на старте, а не при импорте
+    ensure_dirs()
+
+    # Единый ping-тикер для всех WebSocket соединений
+    websocket_hub.start_ping_loop()
+
     # Запускаем Redis listener для WebSocket хаба
     try:
         await websocket_hub.start_redis_listener()
@@ -56,21 +85,93 @@ async def startup_event():
 async def shutdown_event():
     """Событие остановки приложения."""
     logger.info("🛑 Brainzzz API останавливается...")
+    websocket_hub.stop_ping_loop()
     await websocket_hub.stop_redis_listener()
-    # Принудительно закрываем все WebSocket соединения
-    for websocket in list(websocket_hub.active_connections):
-        try:
-            await websocket.close(code=1001, reason="Server shutdown")
-        except Exception:
+    # Снимаем снапшот один раз и сразу чистим набор, чтобы broadcast
+    # не пытался писать в закрывающиеся соединения
+    connections = tuple(websocket_hub.active_connections.values())
+    for ws in connections:
+        websocket_hub.disconnect(ws)
+    results = await asyncio.gather(
+        *(ws.close(code=1001, reason="Server shutdown") for ws in connections),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
             logger.warning("Ошибка при закрытии WebSocket соединения")
-            pass
-    websocket_hub.active_connections.clear()
     logger.info("WebSocket соединения закрыты")
 
 
 # Глобальная переменная для размера популяции
 POPULATION_SIZE = 20
 
+# Кэш сериализованных mock данных: содержимое зависит только от
+# POPULATION_SIZE, поэтому пересчитываем его лишь при изменении размера.
+# Вместе с байтами храним ETag, посчитанный один раз на тело
+_population_cache: Optional[Tuple[bytes, str]] = None
+_brain_cache: Dict[int, Tuple[bytes, str]] = {}
+
+# Повторные опросы дашборда ревалидируются по ETag вместо полного тела
+_CACHE_CONTROL = "max-age=1, must-revalidate"
+
+
+def _make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела (считается один раз на тело)."""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _conditional_response(request: Request, body: bytes, etag: str) -> Response:
+    """Отдает 304 при совпадении If-None-Match, иначе тело с ETag."""
+    headers = {"etag": etag, "cache-control": _CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Мозги с неактивными связями для тестирования фронтенда
+_DISABLED_BRAINS = frozenset({3, 7, 11, 15, 19})
+
+# Потолок размера входящего WebSocket кадра (1 MiB)
+_WS_MAX_FRAME_BYTES = 1 << 20
+
+
+def _build_population_payload() -> bytes:
+    """Сериализует mock список мозгов для текущего POPULATION_SIZE.
+
+    Все колонки считаются векторно в NumPy (один C-проход на поле вместо
+    арифметики в цикле Python), а numpy-скаляры сериализует orjson напрямую
+    через OPT_SERIALIZE_NUMPY. Заметно при больших размерах популяции.
+    """
+    ids = np.arange(1, POPULATION_SIZE + 1, dtype=np.int32)
+
+    mock_population = [
+        {
+            "id": i,
+            "nodes": nodes,
+            "connections": connections,
+            "gp": gp,
+            "fitness": fitness,
+            "age": age,
+        }
+        for i, nodes, connections, gp, fitness, age in zip(
+            ids,
+            7 + ids % 5,  # 7-11 узлов
+            8 + ids % 7,  # 8-14 связей
+            3.5 + ids * 0.1,  # GP от 3.6 до 5.5
+            0.3 + ids * 0.01,  # Fitness от 0.31 до 0.5
+            1 + ids % 3,  # Age от 1 до 3
+        )
+    ]
+
+    return orjson.dumps(mock_population, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _reset_mock_caches():
+    """Сбрасывает кэши mock данных (вызывается при смене POPULATION_SIZE)."""
+    global _population_cache
+    _population_cache = None
+    _brain_cache.clear()
+
+
 # Простые тестовые endpoints
 
 
@@ -91,36 +192,50 @@ async def health_check():
 
 
 @app.get("/api/population")
-async def get_population(limit: Optional[int] = None):
+async def get_population(request: Request, limit: Optional[int] = None):
     """Получение популяции (mock данные)."""
+    global _population_cache
+
     # Если limit не указан, используем глобальный размер популяции
     if limit is None:
         limit = POPULATION_SIZE
 
-    logger.info(f"Запрос популяции с лимитом: {limit}")
-    mock_population = []
-
-    # Генерируем мозги от 1 до POPULATION_SIZE
-    for i in range(1, POPULATION_SIZE + 1):
-        mock_population.append(
-            {
-                "id": i,
-                "nodes": 7 + (i % 5),  # 7-11 узлов
-                "connections": 8 + (i % 7),  # 8-14 связей
-                "gp": 3.5 + (i * 0.1),  # GP от 3.6 до 5.5
-                "fitness": 0.3 + (i * 0.01),  # Fitness от 0.31 до 0.5
-                "age": 1 + (i % 3),  # Age от 1 до 3
-            }
-        )
+    logger.info("Запрос популяции с лимитом: %s", limit)
+
+    # Отдаем заранее сериализованный ответ из кэша
+    if _population_cache is None:
+        body = _build_population_payload()
+        _population_cache = (body, _make_etag(body))
+
+    return _conditional_response(request, *_population_cache)
+
 
-    logger.info(f"Возвращено {len(mock_population)} мозгов")
-    return mock_population
+# Кэш /api/stats в Redis: общий для всех worker'ов, живет недолго,
+# чтобы опросы дашборда не ходили в DuckDB на каждый запрос
+_STATS_CACHE_KEY = "brainzzz-cache:stats"
+_STATS_CACHE_TTL = 30
 
 
 @app.get("/api/stats")
 async def get_stats():
-    """Получение статистики (mock данных)."""
+    """Получение статистики популяции."""
     logger.info("Запрос статистики популяции")
+
+    # Сначала пробуем общий Redis-кэш (hit отдает готовые байты)
+    cached = await redis_adapter.cache_get(_STATS_CACHE_KEY)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    # Читаем готовые агрегаты последнего поколения из DuckDB;
+    # синхронный вызов уходит в thread pool и не блокирует event loop
+    if duckdb_adapter.connected:
+        stats = await asyncio.to_thread(duckdb_adapter.get_latest_stats)
+        if stats is not None:
+            body = orjson.dumps(stats, option=orjson.OPT_NAIVE_UTC)
+            await redis_adapter.cache_set(_STATS_CACHE_KEY, body, _STATS_CACHE_TTL)
+            return Response(content=body, media_type="application/json")
+
+    # Mock данные, если база недоступна или пуста
     return {
         "size": POPULATION_SIZE,
         "avg_fitness": 0.390,
@@ -153,21 +268,13 @@ async def get_websocket_status():
 
 @app.get("/api/ws/test")
 async def test_websocket_connection():
-    """Тестирование WebSocket соединения."""
-    try:
-        # Простая проверка статуса WebSocket сервера
-        return {
-            "status": "success",
-            "message": "WebSocket сервер доступен",
-            "active_connections": len(websocket_hub.active_connections),
-            "max_connections": websocket_hub.max_connections,
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": f"WebSocket ошибка: {str(e)}",
-            "error_type": type(e).__name__,
-        }
+    """Тестирование WebSocket соединения (только чтение состояния хаба)."""
+    return {
+        "status": "success",
+        "message": "WebSocket сервер доступен",
+        "active_connections": len(websocket_hub.active_connections),
+        "max_connections": websocket_hub.max_connections,
+    }
 
 
 @app.post("/api/ws/cleanup")
@@ -186,16 +293,17 @@ async def reset_all_websocket_connections():
     """Принудительный сброс всех WebSocket соединений."""
     logger.warning("[RESET] Принудительный сброс всех WebSocket соединений")
 
-    # Закрываем все активные соединения
-    connections_to_close = list(websocket_hub.active_connections)
-    for websocket in connections_to_close:
-        try:
-            await websocket.close(code=1001, reason="Server reset")
-        except Exception as e:
-            logger.error(f"Ошибка закрытия WebSocket: {e}")
-
-    # Очищаем список соединений
-    websocket_hub.active_connections.clear()
+    # Снимаем снапшот один раз, чистим хаб и закрываем параллельно
+    connections_to_close = tuple(websocket_hub.active_connections.values())
+    for ws in connections_to_close:
+        websocket_hub.disconnect(ws)
+    results = await asyncio.gather(
+        *(ws.close(code=1001, reason="Server reset") for ws in connections_to_close),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка закрытия WebSocket: {result}")
 
     logger.info(f"[SUCCESS] Сброшено {len(connections_to_close)} WebSocket соединений")
     return {
@@ -206,91 +314,97 @@ async def reset_all_websocket_connections():
 
 
 @app.post("/api/evolve")
-async def start_evolution(data: dict):
+async def start_evolution(data: EvolveRequest):
     """Запуск эволюции (mock)."""
     global POPULATION_SIZE
 
-    # Обновляем размер популяции
-    new_size = data.get("population_size", 20)
-    POPULATION_SIZE = new_size
+    # Обновляем размер популяции и сбрасываем кэши mock данных
+    if data.population_size != POPULATION_SIZE:
+        POPULATION_SIZE = data.population_size
+        _reset_mock_caches()
 
-    logger.info(f"Запрос запуска эволюции: {data}")
-    logger.info(f"Размер популяции изменен на: {POPULATION_SIZE}")
+    logger.info("Запрос запуска эволюции: %s", data)
+    logger.info("Размер популяции изменен на: %d", POPULATION_SIZE)
 
     return {
         "message": "Эволюция запущена (mock)",
         "status": "success",
-        "mutation_rate": data.get("mutation_rate", 0.3),
+        "mutation_rate": data.mutation_rate,
         "population_size": POPULATION_SIZE,
     }
 
 
 @app.get("/api/population/{brain_id}")
-async def get_brain(brain_id: int):
+async def get_brain(request: Request, brain_id: int):
     """Получение данных конкретного мозга."""
-    logger.info(f"Запрос данных для мозга #{brain_id}")
+    logger.info("Запрос данных для мозга #%d", brain_id)
 
     # Валидируем brain_id
     if brain_id <= 0 or brain_id > POPULATION_SIZE:
         return {"error": f"ID мозга должен быть от 1 до {POPULATION_SIZE}"}
 
+    # Отдаем заранее сериализованный ответ из кэша
+    cached = _brain_cache.get(brain_id)
+    if cached is None:
+        body = orjson.dumps(_build_mock_brain(brain_id))
+        cached = (body, _make_etag(body))
+        _brain_cache[brain_id] = cached
+
+    return _conditional_response(request, *cached)
+
+
+def _build_mock_brain(brain_id: int) -> Dict[str, Any]:
+    """Генерирует mock данные конкретного мозга."""
     # Генерируем количество узлов и связей, соответствующее сводным данным
     node_count = 7 + (brain_id % 5)  # 7-11 узлов (как в сводных данных)
     connection_count = 8 + (brain_id % 7)  # 8-14 связей (как в сводных данных)
 
-    # Создаем узлы
-    nodes = []
-    for i in range(1, node_count + 1):
-        if i == 1:
-            node_type = "input"
-        elif i == node_count:
-            node_type = "output"
-        else:
-            node_type = "hidden"
-
-        nodes.append(
-            {
-                "id": i,
-                "type": node_type,
-                "activation": "sigmoid",
-                "bias": round(0.1 + (i * 0.05), 2),
-                "threshold": round(0.3 + (i * 0.1), 2),
-            }
+    # Предвычисляем колонки, затем собираем узлы одним списковым включением
+    node_types = ["input"] + ["hidden"] * (node_count - 2) + ["output"]
+    biases = [round(0.1 + (i * 0.05), 2) for i in range(1, node_count + 1)]
+    thresholds = [round(0.3 + (i * 0.1), 2) for i in range(1, node_count + 1)]
+
+    nodes = [
+        {
+            "id": i,
+            "type": node_type,
+            "activation": "sigmoid",
+            "bias": bias,
+            "threshold": threshold,
+        }
+        for i, (node_type, bias, threshold) in enumerate(
+            zip(node_types, biases, thresholds), start=1
         )
-
-    # Создаем связи (соединяем узлы последовательно)
-    connections = []
-    for i in range(1, connection_count + 1):
-        if i < node_count:  # Связь между существующими узлами
-            connections.append(
-                {
-                    "id": i,
-                    "from": i,
-                    "to": i + 1,
-                    "weight": round(-0.8 + (i * 0.3), 2),
-                    "plasticity": 0.1,
-                    "enabled": True,
-                }
-            )
-        else:  # Дополнительные связи между случайными узлами
-            from_node = (i % node_count) + 1
-            to_node = ((i + 1) % node_count) + 1
-            if from_node != to_node:
-                # Некоторые мозги имеют неактивные связи для тестирования
-                # Мозги 3, 7, 11, 15, 19 имеют неактивные связи
-                is_disabled = (
-                    brain_id in [3, 7, 11, 15, 19] and i > connection_count - 2
-                )
-                connections.append(
-                    {
-                        "id": i,
-                        "from": from_node,
-                        "to": to_node,
-                        "weight": round(-0.5 + (i * 0.2), 2),
-                        "plasticity": 0.1,
-                        "enabled": not is_disabled,
-                    }
-                )
+    ]
+
+    # Связи между последовательными узлами
+    connections = [
+        {
+            "id": i,
+            "from": i,
+            "to": i + 1,
+            "weight": round(-0.8 + (i * 0.3), 2),
+            "plasticity": 0.1,
+            "enabled": True,
+        }
+        for i in range(1, min(connection_count + 1, node_count))
+    ]
+
+    # Дополнительные связи между случайными узлами; часть мозгов имеет
+    # неактивные связи для тестирования
+    has_disabled = brain_id in _DISABLED_BRAINS
+    connections.extend(
+        {
+            "id": i,
+            "from": (i % node_count) + 1,
+            "to": ((i + 1) % node_count) + 1,
+            "weight": round(-0.5 + (i * 0.2), 2),
+            "plasticity": 0.1,
+            "enabled": not (has_disabled and i > connection_count - 2),
+        }
+        for i in range(node_count, connection_count + 1)
+        if (i % node_count) + 1 != ((i + 1) % node_count) + 1
+    )
 
     mock_brain = {
         "id": brain_id,
@@ -302,28 +416,40 @@ async def get_brain(brain_id: int):
     }
 
     logger.info(
-        f"Успешно возвращены данные для мозга #{brain_id}: "
+        f"Сгенерированы данные для мозга #{brain_id}: "
         f"{len(nodes)} узлов, {len(connections)} связей"
     )
     return mock_brain
 
 
+# Тестовое событие статично — кодируем его один раз при первом запросе
+_test_event_payload: Optional[bytes] = None
+
+
 @app.post("/api/test-redis")
 async def test_redis_event():
     """Тестовый endpoint для публикации события в Redis."""
+    global _test_event_payload
+
     try:
         # Подключаемся к Redis
         await redis_adapter.connect()
 
-        # Публикуем тестовое событие
-        success = await redis_adapter.publish_event(
-            "test_event",
-            {
-                "message": "Тестовое событие из API",
-                "timestamp": "2025-01-18T00:00:00Z",
-                "data": {"test": True, "value": 42},
-            },
-        )
+        # Публикуем готовые байты без повторной сериализации;
+        # timestamp — целое time_ns вместо форматирования ISO-строки
+        if _test_event_payload is None:
+            _test_event_payload = redis_adapter.encode_event(
+                {
+                    "type": "test_event",
+                    "data": {
+                        "message": "Тестовое событие из API",
+                        "timestamp": time.time_ns(),
+                        "data": {"test": True, "value": 42},
+                    },
+                }
+            )
+
+        success = await redis_adapter.publish_raw(_test_event_payload)
 
         if success:
             return {
@@ -344,7 +470,7 @@ async def test_redis_event():
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint для real-time обновлений."""
     client_id = id(websocket)
-    logger.info(f"[CONNECT] Попытка подключения WebSocket #{client_id}")
+    logger.info("[CONNECT] Попытка подключения WebSocket #%d", client_id)
 
     try:
         # Проверяем лимит соединений перед подключением
@@ -362,36 +488,54 @@ async def websocket_endpoint(websocket: WebSocket):
             return
 
         await websocket_hub.connect(websocket)
-        logger.info(f"[SUCCESS] WebSocket #{client_id} успешно подключен")
+        logger.info("[SUCCESS] WebSocket #%d успешно подключен", client_id)
 
         # Проверяем, что соединение действительно установлено
-        if websocket not in websocket_hub.active_connections:
+        if id(websocket) not in websocket_hub.active_connections:
             logger.warning(
                 f"[WARNING] WebSocket #{client_id} не добавлен в активные соединения"
             )
             return
 
-        # Отправляем ping каждые 30 секунд для проверки соединения
-        ping_task = asyncio.create_task(ping_websocket(websocket, client_id))
-
         try:
             while True:
-                # Держим соединение открытым
-                data = await websocket.receive_text()
+                # Сырой ASGI-кадр: без неявного UTF-8 декодирования в
+                # receive_text() и с контролем размера до обработки
+                msg = await websocket.receive()
+                if msg["type"] == "websocket.disconnect":
+                    logger.info(
+                        "[CONNECT] WebSocket #%d клиент отключился", client_id
+                    )
+                    break
+
+                payload = msg.get("bytes")
+                if payload is None:
+                    payload = msg.get("text", "")
+
+                # Слишком большие кадры закрываем с 1009 Message Too Big
+                if len(payload) > _WS_MAX_FRAME_BYTES:
+                    logger.warning(
+                        "[WARNING] WebSocket #%d: кадр %d байт превышает лимит",
+                        client_id,
+                        len(payload),
+                    )
+                    await websocket.close(code=1009, reason="Message too big")
+                    break
+
+                # Ленивое форматирование: строка не собирается, если DEBUG выключен
                 logger.debug(
-                    f"[MESSAGE] Получено сообщение от WebSocket #{client_id}: "
-                    f"{data}"
+                    "[MESSAGE] Получено сообщение от WebSocket #%d: %s",
+                    client_id,
+                    payload,
                 )
 
         except WebSocketDisconnect:
-            logger.info(f"[CONNECT] WebSocket #{client_id} клиент отключился")
+            logger.info("[CONNECT] WebSocket #%d клиент отключился", client_id)
         except Exception as e:
             logger.error(f"[ERROR] Ошибка WebSocket #{client_id}: {e}")
         finally:
-            # Отменяем ping задачу
-            ping_task.cancel()
             websocket_hub.disconnect(websocket)
-            logger.info(f"[CLEANUP] WebSocket #{client_id} очищен")
+            logger.info("[CLEANUP] WebSocket #%d очищен", client_id)
 
     except Exception as e:
         logger.error(f"[ERROR] Критическая ошибка WebSocket #{client_id}: {e}")
@@ -403,30 +547,44 @@ async def websocket_endpoint(websocket: WebSocket):
             pass
 
 
-async def ping_websocket(websocket: WebSocket, client_id: int):
-    """Отправка ping сообщений для проверки соединения."""
-    try:
-        while True:
-            await asyncio.sleep(30)  # Ping каждые 30 секунд
-            if websocket in websocket_hub.active_connections:
-                try:
-                    await websocket.send_text('{"type": "ping"}')
-                    logger.debug(f"[PING] Ping отправлен WebSocket #{client_id}")
-                except Exception as e:
-                    logger.warning(
-                        f"[WARNING] Не удалось отправить ping WebSocket "
-                        f"#{client_id}: {e}"
-                    )
-                    break
-            else:
-                break
-    except asyncio.CancelledError:
-        logger.debug(f"[PING] Ping задача отменена для WebSocket #{client_id}")
-    except Exception as e:
-        logger.error(f"[ERROR] Ошибка ping WebSocket #{client_id}: {e}")
-
-
 if __name__ == "__main__":
+    import os
+
     import uvicorn
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    try:
+        import uvloop  # noqa: F401
+
+        loop = "uvloop"
+    except ImportError:
+        # uvloop недоступен (например, Windows) — стандартный asyncio
+        loop = "auto"
+
+    if settings.api_debug:
+        # Dev-режим: один worker с авто-перезагрузкой
+        uvicorn.run(
+            "main:app",
+            host=settings.api_host,
+            port=settings.api_port,
+            reload=True,
+        )
+    else:
+        # Продакшен: worker на ядро, C-парсер HTTP и минимум логов.
+        # Broadcast между worker'ами идет через Redis Pub/Sub.
+        # Строка импорта вместо объекта: обязательна для workers > 1
+        uvicorn.run(
+            "main:app",
+            host=settings.api_host,
+            port=settings.api_port,
+            loop=loop,
+            http="httptools",
+            ws="websockets",
+            workers=os.cpu_count() or 2,
+            ws_ping_interval=settings.ws_ping_interval,
+            # Кадры больше лимита отбрасывает сам ws-протокол
+            ws_max_size=_WS_MAX_FRAME_BYTES,
+            access_log=False,
+            log_level="warning",
+            # Для localhost/LAN сжатие кадров тратит CPU без выигрыша в полосе
+            ws_per_message_deflate=False,
+        )
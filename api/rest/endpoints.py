@@ -1,233 +1,357 @@
 """
 REST API endpoints для управления симуляцией.
+
+Handlers не оборачиваются в try/except Exception: необработанные ошибки
+поднимаются до app-level обработчика, который возвращает единый 500.
 """
 
+import asyncio
+import functools
+import hashlib
 import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Request, Response
 
-from api.core.adapters import duckdb_adapter, redis_adapter
+from core.adapters import duckdb_adapter, redis_adapter
+from core.schemas import EvolveRequest
+from core.settings import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Кэш распарсенных снапшотов: имя файла -> (mtime, size, данные).
+# Файл перечитывается только когда изменился на диске
+_snapshot_cache: Dict[str, Tuple[float, int, Dict[str, Any]]] = {}
+
+# Список снапшотов кэшируется на короткий TTL, чтобы поглотить
+# частый polling со стороны дашборда
+_SNAPSHOT_LIST_TTL = 1.0
+_snapshot_list: list = []
+_snapshot_list_ts = 0.0
+
+# Mock данные детерминированы, поэтому строятся один раз при импорте
+_MOCK_POPULATION = [
+    {
+        "id": i,
+        "nodes": 7 + (i % 5),  # 7-11 узлов
+        "connections": 8 + (i % 7),  # 8-14 связей
+        "gp": 3.5 + (i * 0.1),  # GP от 3.6 до 5.5
+        "fitness": 0.3 + (i * 0.01),  # Fitness от 0.31 до 0.5
+        "age": 1 + (i % 3),  # Age от 1 до 3
+    }
+    for i in range(1, 21)
+]
 
-@router.get("/health")
-async def health_check():
-    """Проверка здоровья API."""
-    return {
+# Повторные опросы дашборда ревалидируются по ETag вместо полного тела
+_CACHE_CONTROL = "max-age=1, must-revalidate"
+
+
+def _make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому тела (считается один раз на тело)."""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _conditional_response(request: Request, body: bytes, etag: str) -> Response:
+    """Отдает 304 при совпадении If-None-Match, иначе тело с ETag."""
+    headers = {"etag": etag, "cache-control": _CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Тело /health статично — сериализуем его один раз при импорте
+_HEALTH_BODY = orjson.dumps(
+    {
         "status": "healthy",
         "timestamp": "2025-01-18T00:00:00Z",
         "version": "1.0.0",
     }
+)
+_HEALTH_ETAG = _make_etag(_HEALTH_BODY)
+
+# Тела /status зависят только от пары флагов подключений
+_status_bodies: Dict[Tuple[bool, bool], Tuple[bytes, str]] = {}
+
+
+@router.get("/health")
+async def health_check(request: Request):
+    """Проверка здоровья API."""
+    # Готовые байты: без jsonable_encoder и сериализации на каждый запрос
+    return _conditional_response(request, _HEALTH_BODY, _HEALTH_ETAG)
 
 
 @router.get("/status")
-async def system_status():
+async def system_status(request: Request):
     """Статус системы."""
-    try:
-        # Проверяем подключения
-        redis_status = redis_adapter.connected
-        duckdb_status = duckdb_adapter.connected
-
-        return {
-            "status": "running",
-            "connections": {"redis": redis_status, "duckdb": duckdb_status},
-            "timestamp": "2025-01-18T00:00:00Z",
-        }
-    except Exception as e:
-        logger.error(f"Ошибка получения статуса: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка получения статуса")
+    # Тело пересобирается только при смене состояния подключений
+    key = (redis_adapter.connected, duckdb_adapter.connected)
+    cached = _status_bodies.get(key)
+    if cached is None:
+        body = orjson.dumps(
+            {
+                "status": "running",
+                "connections": {"redis": key[0], "duckdb": key[1]},
+                "timestamp": "2025-01-18T00:00:00Z",
+            }
+        )
+        cached = (body, _make_etag(body))
+        _status_bodies[key] = cached
+
+    return _conditional_response(request, *cached)
 
 
 @router.get("/population/stats")
-async def get_population_stats(limit: int = 100):
-    """Получение статистики популяции."""
-    try:
-        if not duckdb_adapter.connected:
-            # Возвращаем заглушку если DB недоступна
-            return {"message": "DuckDB недоступен", "data": []}
-
-        snapshots = duckdb_adapter.get_population_snapshots(limit)
-        return {"data": snapshots, "count": len(snapshots)}
-    except Exception as e:
-        logger.error(f"Ошибка получения статистики популяции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка получения статистики")
+async def get_population_stats(
+    limit: int = 100, after: Optional[int] = None, page_size: int = 50
+):
+    """Получение статистики популяции.
+
+    С параметром after ответ отдается страницами по курсору id:
+    клиент передает next из предыдущего ответа и получает следующую
+    страницу вместо всего массива целиком.
+    """
+    if not duckdb_adapter.connected:
+        # Возвращаем заглушку если DB недоступна
+        return {"message": "DuckDB недоступен", "data": []}
+
+    if after is not None:
+        # Курсорная страница: объем ответа ограничен page_size
+        # независимо от размера таблицы
+        page_size = min(max(page_size, 1), 500)
+        snapshots = await asyncio.to_thread(
+            duckdb_adapter.get_population_snapshots_page, after, page_size
+        )
+        next_cursor = (
+            snapshots[-1]["id"] if len(snapshots) == page_size else None
+        )
+        return {"data": snapshots, "count": len(snapshots), "next": next_cursor}
+
+    # Синхронный запрос уходит в thread pool и не блокирует event loop
+    # (и WebSocket broadcast'ы) на время чтения из DuckDB
+    snapshots = await asyncio.to_thread(
+        duckdb_adapter.get_population_snapshots, limit
+    )
+    return {"data": snapshots, "count": len(snapshots)}
+
+
+# Срезы популяции сериализуются один раз на каждый встретившийся limit
+_population_payloads: Dict[int, Tuple[bytes, str]] = {}
 
 
 @router.get("/population")
-async def get_population(limit: int = 100):
+async def get_population(request: Request, limit: int = 100):
     """Получение популяции (обратная совместимость)."""
-    try:
-        logger.info(f"Запрос популяции с лимитом: {limit}")
-
-        # Возвращаем mock данные для тестирования фронтенда
-        # Генерируем динамически в зависимости от лимита
-        mock_population = []
-        for i in range(1, min(limit + 1, 21)):  # Максимум 20 мозгов
-            mock_population.append(
-                {
-                    "id": i,
-                    "nodes": 7 + (i % 5),  # 7-11 узлов
-                    "connections": 8 + (i % 7),  # 8-14 связей
-                    "gp": 3.5 + (i * 0.1),  # GP от 3.6 до 5.5
-                    "fitness": 0.3 + (i * 0.01),  # Fitness от 0.31 до 0.5
-                    "age": 1 + (i % 3),  # Age от 1 до 3
-                }
-            )
-
-        logger.info(f"Возвращено {len(mock_population)} мозгов")
-        return mock_population
-
-    except Exception as e:
-        logger.error(f"Ошибка получения популяции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка получения популяции")
+    logger.info("Запрос популяции с лимитом: %s", limit)
+
+    # Mock данные построены при импорте — остается только срез,
+    # а байты ответа кэшируются по фактическому размеру среза
+    count = min(max(limit, 0), len(_MOCK_POPULATION))
+    cached = _population_payloads.get(count)
+    if cached is None:
+        body = orjson.dumps(_MOCK_POPULATION[:count])
+        cached = (body, _make_etag(body))
+        _population_payloads[count] = cached
+
+    logger.info("Возвращено %d мозгов", count)
+    return _conditional_response(request, *cached)
 
 
 @router.get("/population/{brain_id}")
-async def get_brain(brain_id: int):
+async def get_brain(request: Request, brain_id: int):
     """Получение данных конкретного мозга."""
-    try:
-        logger.info(f"Запрос данных для мозга #{brain_id}")
-
-        # Валидируем brain_id
-        if brain_id <= 0 or brain_id > 20:
-            return {"error": "ID мозга должен быть от 1 до 20"}
-
-        # Генерируем количество узлов и связей
-        node_count = 7 + (brain_id % 5)  # 7-11 узлов
-        connection_count = 8 + (brain_id % 7)  # 8-14 связей
-
-        # Создаем узлы
-        nodes = []
-        for i in range(1, node_count + 1):
-            if i == 1:
-                node_type = "input"
-            elif i == node_count:
-                node_type = "output"
-            else:
-                node_type = "hidden"
-
-            nodes.append(
-                {
-                    "id": i,
-                    "type": node_type,
-                    "activation": "sigmoid",
-                    "bias": round(0.1 + (i * 0.05), 2),
-                    "threshold": round(0.3 + (i * 0.1), 2),
-                }
-            )
-
-        # Создаем связи (соединяем узлы последовательно)
-        connections = []
-        for i in range(1, connection_count + 1):
-            if i < node_count:  # Связь между существующими узлами
-                connections.append(
-                    {
-                        "id": i,
-                        "from_node": i,
-                        "to_node": i + 1,
-                        "weight": round(0.5 + (i * 0.1), 2),
-                        "enabled": True,
-                    }
-                )
-            else:  # Дополнительные связи между случайными узлами
-                from_node = (i % node_count) + 1
-                to_node = ((i + 1) % node_count) + 1
-                if from_node != to_node:
-                    connections.append(
-                        {
-                            "id": i,
-                            "from_node": from_node,
-                            "to_node": to_node,
-                            "weight": round(0.3 + (i * 0.05), 2),
-                            "enabled": True,
-                        }
-                    )
-
-        return {
-            "id": brain_id,
-            "nodes": nodes,
-            "connections": connections,
-            "metadata": {
-                "total_nodes": node_count,
-                "total_connections": len(connections),
-                "generation": 1,
-                "fitness": 0.3 + (brain_id * 0.01),
-            },
+    logger.info("Запрос данных для мозга #%d", brain_id)
+
+    # Валидируем brain_id
+    if brain_id <= 0 or brain_id > 20:
+        return {"error": "ID мозга должен быть от 1 до 20"}
+
+    # Данные детерминированы по brain_id — отдаем готовые байты из кэша
+    return _conditional_response(request, *_build_brain_payload(brain_id))
+
+
+@functools.lru_cache(maxsize=1024)
+def _build_brain_payload(brain_id: int) -> Tuple[bytes, str]:
+    """Сериализованные данные мозга с ETag; строятся один раз на brain_id."""
+    body = orjson.dumps(_build_mock_brain(brain_id))
+    return body, _make_etag(body)
+
+
+def _build_mock_brain(brain_id: int) -> Dict[str, Any]:
+    """Генерирует mock данные конкретного мозга."""
+    # Генерируем количество узлов и связей
+    node_count = 7 + (brain_id % 5)  # 7-11 узлов
+    connection_count = 8 + (brain_id % 7)  # 8-14 связей
+
+    # Создаем узлы
+    node_types = ["input"] + ["hidden"] * (node_count - 2) + ["output"]
+    nodes = [
+        {
+            "id": i,
+            "type": node_type,
+            "activation": "sigmoid",
+            "bias": round(0.1 + (i * 0.05), 2),
+            "threshold": round(0.3 + (i * 0.1), 2),
         }
+        for i, node_type in enumerate(node_types, start=1)
+    ]
+
+    # Связи между последовательными узлами
+    connections = [
+        {
+            "id": i,
+            "from_node": i,
+            "to_node": i + 1,
+            "weight": round(0.5 + (i * 0.1), 2),
+            "enabled": True,
+        }
+        for i in range(1, min(connection_count + 1, node_count))
+    ]
+
+    # Дополнительные связи между случайными узлами
+    connections.extend(
+        {
+            "id": i,
+            "from_node": (i % node_count) + 1,
+            "to_node": ((i + 1) % node_count) + 1,
+            "weight": round(0.3 + (i * 0.05), 2),
+            "enabled": True,
+        }
+        for i in range(node_count, connection_count + 1)
+        if (i % node_count) + 1 != ((i + 1) % node_count) + 1
+    )
+
+    return {
+        "id": brain_id,
+        "nodes": nodes,
+        "connections": connections,
+        "metadata": {
+            "total_nodes": node_count,
+            "total_connections": len(connections),
+            "generation": 1,
+            "fitness": 0.3 + (brain_id * 0.01),
+        },
+    }
 
-    except Exception as e:
-        logger.error(f"Ошибка получения данных мозга #{brain_id}: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка получения данных мозга")
+
+@router.get("/snapshots")
+async def list_snapshots():
+    """Список сохраненных снапшотов эволюции."""
+    global _snapshot_list, _snapshot_list_ts
+
+    now = time.monotonic()
+    if _snapshot_list and now - _snapshot_list_ts < _SNAPSHOT_LIST_TTL:
+        return {"data": _snapshot_list, "count": len(_snapshot_list)}
+
+    snapshots_dir = settings.DATA_DIR / "snapshots"
+    if not snapshots_dir.is_dir():
+        return {"data": [], "count": 0}
+
+    snapshots = []
+    seen = set()
+    to_load = []
+
+    # scandir отдает DirEntry с уже закэшированным stat;
+    # follow_symlinks=False избегает лишнего syscall на ссылку
+    for entry in os.scandir(snapshots_dir):
+        if not entry.name.endswith(".json") or not entry.is_file(
+            follow_symlinks=False
+        ):
+            continue
+
+        stat = entry.stat(follow_symlinks=False)
+        seen.add(entry.name)
+
+        cached = _snapshot_cache.get(entry.name)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            snapshots.append(cached[2])
+        else:
+            # Перечитываем только изменившиеся файлы
+            to_load.append((entry.name, entry.path, stat))
+
+    if to_load:
+        # Чтение и парсинг в пуле потоков: файлы обрабатываются
+        # параллельно и не блокируют event loop
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_load_snapshot, path) for _, path, _ in to_load)
+        )
+        for (name, _, stat), data in zip(to_load, results):
+            if data is not None:
+                _snapshot_cache[name] = (stat.st_mtime, stat.st_size, data)
+                snapshots.append(data)
+
+    # Убираем из кэша исчезнувшие файлы
+    for name in list(_snapshot_cache):
+        if name not in seen:
+            del _snapshot_cache[name]
+
+    snapshots.sort(key=lambda s: s.get("timestamp", ""), reverse=True)
+    _snapshot_list = snapshots
+    _snapshot_list_ts = now
+
+    return {"data": snapshots, "count": len(snapshots)}
+
+
+def _load_snapshot(path: str):
+    """Читает и парсит файл снапшота; None при ошибке."""
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError) as e:
+        logger.error(f"Ошибка чтения снапшота {path}: {e}")
+        return None
 
 
 @router.get("/evolution/status")
 async def get_evolution_status():
     """Получение статуса эволюции."""
-    try:
-        return {
-            "status": "running",
-            "generation": 1,
-            "population_size": 20,
-            "best_fitness": 0.454,
-            "avg_fitness": 0.390,
-            "timestamp": "2025-01-18T00:00:00Z",
-        }
-    except Exception as e:
-        logger.error(f"Ошибка получения статуса эволюции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка получения статуса")
+    return {
+        "status": "running",
+        "generation": 1,
+        "population_size": 20,
+        "best_fitness": 0.454,
+        "avg_fitness": 0.390,
+        "timestamp": "2025-01-18T00:00:00Z",
+    }
 
 
 @router.post("/evolution/start")
-async def start_evolution(data: dict):
+async def start_evolution(data: EvolveRequest):
     """Запуск эволюции."""
-    try:
-        logger.info(f"Запрос запуска эволюции: {data}")
-        return {
-            "message": "Эволюция запущена",
-            "status": "success",
-            "mutation_rate": data.get("mutation_rate", 0.3),
-            "population_size": data.get("population_size", 20),
-        }
-    except Exception as e:
-        logger.error(f"Ошибка запуска эволюции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка запуска эволюции")
+    logger.info("Запрос запуска эволюции: %s", data)
+    return {
+        "message": "Эволюция запущена",
+        "status": "success",
+        "mutation_rate": data.mutation_rate,
+        "population_size": data.population_size,
+    }
 
 
 @router.post("/evolution/pause")
 async def pause_evolution():
     """Приостановка эволюции."""
-    try:
-        logger.info("Запрос приостановки эволюции")
-        return {"message": "Эволюция приостановлена", "status": "paused"}
-    except Exception as e:
-        logger.error(f"Ошибка приостановки эволюции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка приостановки")
+    logger.info("Запрос приостановки эволюции")
+    return {"message": "Эволюция приостановлена", "status": "paused"}
 
 
 @router.post("/evolution/resume")
 async def resume_evolution():
     """Возобновление эволюции."""
-    try:
-        logger.info("Запрос возобновления эволюции")
-        return {"message": "Эволюция возобновлена", "status": "running"}
-    except Exception as e:
-        logger.error(f"Ошибка возобновления эволюции: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка возобновления")
+    logger.info("Запрос возобновления эволюции")
+    return {"message": "Эволюция возобновлена", "status": "running"}
 
 
 @router.post("/evolution/snapshot")
 async def create_snapshot():
     """Создание снапшота эволюции."""
-    try:
-        logger.info("Запрос создания снапшота")
-        return {
-            "message": "Снапшот создан",
-            "status": "success",
-            "snapshot_id": "snapshot_20250118_001",
-        }
-    except Exception as e:
-        logger.error(f"Ошибка создания снапшота: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка создания снапшота")
+    logger.info("Запрос создания снапшота")
+    return {
+        "message": "Снапшот создан",
+        "status": "success",
+        "snapshot_id": "snapshot_20250118_001",
+    }
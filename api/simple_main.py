@@ -6,6 +6,7 @@ import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -16,6 +17,8 @@ app = FastAPI(
     title="🧠 Brainzzz API (Simple)",
     description="Упрощенная версия API для тестирования",
     version="1.0.0",
+    # Все ответы сериализуются через orjson (C-кодек)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -27,84 +30,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Простые тестовые endpoints
-
-
-@app.get("/")
-async def root():
-    """Главная страница API."""
-    return {
-        "message": "🧠 Brainzzz API (Simple)",
-        "version": "1.0.0",
-        "status": "working",
-    }
-
-
-@app.get("/api/health")
-async def health_check():
-    """Проверка здоровья API."""
-    return {
-        "status": "healthy",
-        "timestamp": "2025-01-18T00:00:00Z",
-        "version": "1.0.0",
-    }
-
-
-@app.get("/api/population")
-async def get_population(limit: int = 10):
-    """Получение популяции (mock данные)."""
-    logger.info(f"Запрос популяции с лимитом: {limit}")
-    mock_population = []
-    for i in range(1, min(limit + 1, 21)):  # Максимум 20 мозгов
-        mock_population.append(
-            {
-                "id": i,
-                "nodes": 7 + (i % 5),  # 7-11 узлов
-                "connections": 8 + (i % 7),  # 8-14 связей
-                "gp": 3.5 + (i * 0.1),  # GP от 3.6 до 5.5
-                "fitness": 0.3 + (i * 0.01),  # Fitness от 0.31 до 0.5
-                "age": 1 + (i % 3),  # Age от 1 до 3
-            }
-        )
-    logger.info(f"Возвращено {len(mock_population)} мозгов")
-    return mock_population
-
-
-@app.get("/api/stats")
-async def get_stats():
-    """Получение статистики (mock данные)."""
-    logger.info("Запрос статистики популяции")
-    return {
-        "size": 20,
-        "avg_fitness": 0.390,
-        "max_fitness": 0.454,
-        "avg_nodes": 8.0,
-        "avg_connections": 10.0,
-        "generation": 1,
-    }
-
-
-@app.post("/api/evolve")
-async def start_evolution(data: dict):
-    """Запуск эволюции (mock)."""
-    logger.info(f"Запрос запуска эволюции: {data}")
-    return {
-        "message": "Эволюция запущена (mock)",
-        "status": "success",
-        "mutation_rate": data.get("mutation_rate", 0.3),
-        "population_size": data.get("population_size", 20),
-    }
+# Mock данные детерминированы и ограничены 20 мозгами, поэтому
+# строятся один раз при импорте — handlers только срезают и индексируют
 
 
-@app.get("/api/population/{brain_id}")
-async def get_brain(brain_id: int):
-    """Получение данных конкретного мозга."""
-    logger.info(f"Запрос данных для мозга #{brain_id}")
-
-    # Валидируем brain_id
-    if brain_id <= 0 or brain_id > 20:
-        return {"error": "ID мозга должен быть от 1 до 20"}
-
+def _build_mock_brain(brain_id: int) -> dict:
+    """Генерирует mock данные конкретного мозга."""
     # Генерируем количество узлов и связей, соответствующее сводным данным
     node_count = 7 + (brain_id % 5)  # 7-11 узлов (как в сводных данных)
     connection_count = 8 + (brain_id % 7)  # 8-14 связей (как в сводных данных)
@@ -163,7 +94,7 @@ async def get_brain(brain_id: int):
                     }
                 )
 
-    mock_brain = {
+    return {
         "id": brain_id,
         "nodes": nodes,
         "connections": connections,
@@ -172,9 +103,95 @@ async def get_brain(brain_id: int):
         "age": 1 + (brain_id % 3),  # Age от 1 до 3
     }
 
+
+_MOCK_POPULATION = [
+    {
+        "id": i,
+        "nodes": 7 + (i % 5),  # 7-11 узлов
+        "connections": 8 + (i % 7),  # 8-14 связей
+        "gp": 3.5 + (i * 0.1),  # GP от 3.6 до 5.5
+        "fitness": 0.3 + (i * 0.01),  # Fitness от 0.31 до 0.5
+        "age": 1 + (i % 3),  # Age от 1 до 3
+    }
+    for i in range(1, 21)
+]
+
+_MOCK_BRAINS = {i: _build_mock_brain(i) for i in range(1, 21)}
+
+
+# Простые тестовые endpoints
+
+
+@app.get("/")
+async def root():
+    """Главная страница API."""
+    return {
+        "message": "🧠 Brainzzz API (Simple)",
+        "version": "1.0.0",
+        "status": "working",
+    }
+
+
+@app.get("/api/health")
+async def health_check():
+    """Проверка здоровья API."""
+    return {
+        "status": "healthy",
+        "timestamp": "2025-01-18T00:00:00Z",
+        "version": "1.0.0",
+    }
+
+
+@app.get("/api/population")
+async def get_population(limit: int = 10):
+    """Получение популяции (mock данные)."""
+    logger.info("Запрос популяции с лимитом: %s", limit)
+    mock_population = _MOCK_POPULATION[: max(limit, 0)]  # Максимум 20 мозгов
+    logger.info("Возвращено %d мозгов", len(mock_population))
+    return mock_population
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Получение статистики (mock данные)."""
+    logger.info("Запрос статистики популяции")
+    return {
+        "size": 20,
+        "avg_fitness": 0.390,
+        "max_fitness": 0.454,
+        "avg_nodes": 8.0,
+        "avg_connections": 10.0,
+        "generation": 1,
+    }
+
+
+@app.post("/api/evolve")
+async def start_evolution(data: dict):
+    """Запуск эволюции (mock)."""
+    logger.info("Запрос запуска эволюции: %s", data)
+    return {
+        "message": "Эволюция запущена (mock)",
+        "status": "success",
+        "mutation_rate": data.get("mutation_rate", 0.3),
+        "population_size": data.get("population_size", 20),
+    }
+
+
+@app.get("/api/population/{brain_id}")
+async def get_brain(brain_id: int):
+    """Получение данных конкретного мозга."""
+    logger.info("Запрос данных для мозга #%d", brain_id)
+
+    # Данные построены при импорте — остается только индексирование
+    mock_brain = _MOCK_BRAINS.get(brain_id)
+    if mock_brain is None:
+        return {"error": "ID мозга должен быть от 1 до 20"}
+
     logger.info(
-        f"Успешно возвращены данные для мозга #{brain_id}: "
-        f"{len(nodes)} узлов, {len(connections)} связей"
+        "Успешно возвращены данные для мозга #%d: %d узлов, %d связей",
+        brain_id,
+        len(mock_brain["nodes"]),
+        len(mock_brain["connections"]),
     )
     return mock_brain
 
@@ -182,4 +199,6 @@ async def get_brain(brain_id: int):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # Access-лог пишет строку на каждый запрос и заметно режет пропускную
+    # способность mock endpoints
+    uvicorn.run(app, host="127.0.0.1", port=8000, access_log=False)
@@ -4,66 +4,296 @@ WebSocket хаб для ретрансляции событий из Redis в б
 
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, List, Optional
+
+import msgspec
+import orjson
+
+try:
+    import zstandard
+except ImportError:
+    # zstandard опционален: без него сжатие кадров просто выключено
+    zstandard = None
 
 from core.adapters import redis_adapter
 from core.schemas import MessageType, WebSocketMessage
 from core.settings import settings
 from fastapi import WebSocket
+from starlette.websockets import WebSocketState
 
 logger = logging.getLogger(__name__)
 
 
+# Ping кодируется один раз для всех соединений
+_PING_PAYLOAD = '{"type": "ping"}'
+
+# Кодек broadcast-кадров: msgpack примерно вдвое компактнее JSON
+# на графовых payload'ах и кодируется быстрее
+_WS_MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+
+
+def _encode_ws_message(data: Any) -> bytes:
+    """Кодирует payload broadcast-кадра согласно settings.ws_codec."""
+    if settings.ws_codec == "msgpack":
+        return _WS_MSGPACK_ENCODER.encode(data)
+    return orjson.dumps(data)
+
+
+# Переиспользуемый компрессор: создание ZstdCompressor на кадр дорого
+_ZSTD_COMPRESSOR = (
+    zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+)
+
+# Кадры меньше порога не сжимаем: выигрыш не окупает CPU и префикс
+_ZSTD_THRESHOLD = 1024
+
+
+def _frame_payload(raw: bytes) -> bytes:
+    """Оформляет broadcast-кадр с опциональным zstd-сжатием.
+
+    При включенном ws_zstd кадр получает байт-префикс формата:
+    "Z" — zstd-сжатое тело, "R" — как есть. Графовые payload'ы с
+    повторяющимися ключами сжимаются в разы, что снижает стоимость
+    fan-out на медленных клиентах.
+    """
+    if not settings.ws_zstd or _ZSTD_COMPRESSOR is None:
+        return raw
+    if len(raw) > _ZSTD_THRESHOLD:
+        return b"Z" + _ZSTD_COMPRESSOR.compress(raw)
+    return b"R" + raw
+
+
+def _wire_payload(data: Any):
+    """Кодирует payload кадра для отправки в сокет.
+
+    По умолчанию кадр уходит текстом: браузерный клиент делает
+    JSON.parse(event.data) и бинарный кадр (Blob) сломал бы его.
+    orjson-байты — это готовый UTF-8 JSON, decode() лишь снимает
+    копию без повторной сериализации. Бинарными уходят только
+    opt-in форматы (msgpack/zstd), требующие понимающего клиента.
+    """
+    raw = _frame_payload(_encode_ws_message(data))
+    if settings.ws_codec == "msgpack" or (
+        settings.ws_zstd and _ZSTD_COMPRESSOR is not None
+    ):
+        return raw
+    return raw.decode()
+
+
+# Соответствие типов Redis-событий типам WebSocket сообщений:
+# один hash-lookup на событие вместо цепочки сравнений
+_EVENT_TO_MSGTYPE = {
+    "population_update": MessageType.POPULATION_UPDATE,
+    "brain_update": MessageType.BRAIN_UPDATE,
+    "task_update": MessageType.TASK_UPDATE,
+    "evolution_step": MessageType.EVOLUTION_STEP,
+    "system_status": MessageType.SYSTEM_STATUS,
+    "error": MessageType.ERROR,
+}
+
+# Метка времени с точностью ~1 секунда: при тысячах событий в секунду
+# datetime.now() + isoformat() на каждое событие заметны в профиле
+_ts_cache: Dict[str, Any] = {"t": 0.0, "iso": "", "dt": datetime.now()}
+
+
+def _refresh_ts():
+    """Обновляет кэш метки времени не чаще раза в секунду."""
+    t = time.time()
+    if t - _ts_cache["t"] >= 1.0:
+        dt = datetime.fromtimestamp(t)
+        _ts_cache["t"] = t
+        _ts_cache["iso"] = dt.isoformat()
+        _ts_cache["dt"] = dt
+
+
+def _now_iso() -> str:
+    """ISO-метка времени из кэша (гранулярность ~1с)."""
+    _refresh_ts()
+    return _ts_cache["iso"]
+
+
+def _now_dt() -> datetime:
+    """datetime из кэша (гранулярность ~1с)."""
+    _refresh_ts()
+    return _ts_cache["dt"]
+
+
+# Приветствие статично с точностью до метки времени, поэтому байты
+# пересобираются не чаще раза в секунду, а не на каждый accept
+_welcome_cache: Dict[str, Any] = {"iso": None, "payload": b""}
+
+
+def _welcome_payload() -> str:
+    """Сериализованное приветственное сообщение (кэш ~1с).
+
+    Всегда текстовый JSON независимо от ws_codec: клиент должен
+    прочитать приветствие до каких-либо договоренностей о формате.
+    """
+    iso = _now_iso()
+    if _welcome_cache["iso"] != iso:
+        _welcome_cache["iso"] = iso
+        _welcome_cache["payload"] = orjson.dumps(
+            {
+                "type": MessageType.SYSTEM_STATUS.value,
+                "schema": "1.0.0",
+                "ts": iso,
+                "data": {
+                    "status": "connected",
+                    "message": "Добро пожаловать в Brainzzz!",
+                    "timestamp": iso,
+                },
+            }
+        ).decode()
+    return _welcome_cache["payload"]
+
+
+def _ws_frame(msg_type: MessageType, data: Any) -> Dict[str, Any]:
+    """Кадр WebSocket сообщения как plain dict.
+
+    События из Redis — внутренние и уже доверенные, поэтому на пути
+    ретрансляции pydantic-валидация не нужна: словарь собирается
+    напрямую в форме model_dump() и сразу уходит в кодек.
+    """
+    return {
+        "type": msg_type.value,
+        "schema": "1.0.0",
+        "ts": _now_iso(),
+        "data": data,
+    }
+
+
 class WebSocketHub:
     """Хаб для управления WebSocket соединениями."""
 
+    # Потолок исходящей очереди на соединение: медленный клиент
+    # упирается в лимит и отключается, не раздувая память
+    _QUEUE_MAXSIZE = 256
+
+    # Окно коалесинга Redis-событий перед broadcast: шторм событий
+    # за окно уходит одним кадром на клиента вместо кадра на событие
+    _BATCH_WINDOW = 0.01
+
     def __init__(self, max_connections: Optional[int] = None):
-        self.active_connections: Set[WebSocket] = set()
+        # Реестр соединений по id(ws): целочисленные ключи хэшируются
+        # дешевле WebSocket-объектов, удаление O(1), а снимок для
+        # итерации — это list(values()) вместо копии set
+        self.active_connections: Dict[int, WebSocket] = {}
         self.redis_callback_task = None
+        self.ping_task: Optional[asyncio.Task] = None
         self.max_connections = max_connections or settings.ws_max_connections
+        # Исходящая очередь и writer-задача на соединение: broadcast
+        # только кладет payload и не ждет медленных клиентов
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._writers: Dict[int, asyncio.Task] = {}
+        # Последний разосланный снимок популяции по id мозга: по нему
+        # считаются дельты, а новые клиенты получают полный снимок
+        self._last_population: Dict[Any, Dict[str, Any]] = {}
+        # Проверка лимита и регистрация — одна критическая секция:
+        # параллельные connect не проскакивают мимо max_connections
+        self._accept_lock = asyncio.Lock()
+        # Буфер коалесинга: события копятся здесь, flush-задача
+        # просыпается по Event и рассылает пачку
+        self._event_batch: List[Dict[str, Any]] = []
+        self._event_batch_ready = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Event loop кэшируется при первом использовании: create_task
+        # на горячем пути идет через сохраненную ссылку без повторного
+        # get_running_loop() на каждый вызов
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_task(self, coro) -> asyncio.Task:
+        """create_task через закэшированный loop (один lookup на хаб)."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.create_task(coro)
+
+    def start_ping_loop(self):
+        """Запускает единый ping-тикер для всех соединений."""
+        if self.ping_task is None:
+            self.ping_task = self._create_task(self._ping_loop())
+
+    def stop_ping_loop(self):
+        """Останавливает ping-тикер."""
+        if self.ping_task is not None:
+            self.ping_task.cancel()
+            self.ping_task = None
+
+    async def _ping_loop(self):
+        """Один тикер вместо задачи на каждое соединение."""
+        try:
+            while True:
+                await asyncio.sleep(settings.ws_ping_interval)
+
+                # Ping уходит через очереди; мертвые соединения
+                # отключает writer при ошибке отправки
+                self._enqueue_all(_PING_PAYLOAD)
+
+        except asyncio.CancelledError:
+            logger.debug("[PING] Ping-тикер остановлен")
 
     async def connect(self, websocket: WebSocket):
         """Подключение нового WebSocket клиента."""
         client_id = id(websocket)
 
-        # Проверяем лимит соединений
-        if len(self.active_connections) >= self.max_connections:
-            logger.warning(
-                f"[ERROR] Достигнут лимит WebSocket соединений: {self.max_connections}"
-            )
-            await websocket.close(code=1013, reason="Too many connections")
-            return
-
-        # Небольшая задержка для предотвращения race conditions
-        await asyncio.sleep(0.1)  # Уменьшаем задержку
-
         try:
-            await websocket.accept()
-            self.active_connections.add(websocket)
+            # Лимит и регистрация проверяются атомарно под lock'ом
+            # вместо прежней задержки-"от гонок": accept происходит
+            # сразу, а параллельные подключения не превышают лимит
+            async with self._accept_lock:
+                if len(self.active_connections) >= self.max_connections:
+                    logger.warning(
+                        "[ERROR] Достигнут лимит WebSocket соединений: %d",
+                        self.max_connections,
+                    )
+                    await websocket.close(
+                        code=1013, reason="Too many connections"
+                    )
+                    return
+
+                await websocket.accept()
+                self.active_connections[client_id] = websocket
+                queue: asyncio.Queue = asyncio.Queue(
+                    maxsize=self._QUEUE_MAXSIZE
+                )
+                self._queues[client_id] = queue
+                self._writers[client_id] = self._create_task(
+                    self._writer(websocket, queue)
+                )
             logger.info(
-                f"[SUCCESS] WebSocket #{client_id} подключен. "
-                f"Всего: {len(self.active_connections)}"
+                "[SUCCESS] WebSocket #%d подключен. Всего: %d",
+                client_id,
+                len(self.active_connections),
             )
 
-            # Отправляем приветственное сообщение
-            welcome_msg = WebSocketMessage(
-                type=MessageType.SYSTEM_STATUS,
-                data={
-                    "status": "connected",
-                    "message": "Добро пожаловать в Brainzzz!",
-                    "timestamp": datetime.now().isoformat(),
-                },
-            )
-            await self.send_personal_message(websocket, welcome_msg)
+            # Отправляем приветственное сообщение (готовая строка без
+            # построения pydantic-модели на каждый accept)
+            await websocket.send_text(_welcome_payload())
             logger.info(
-                f"📤 Приветственное сообщение отправлено WebSocket #{client_id}"
+                "📤 Приветственное сообщение отправлено WebSocket #%d", client_id
             )
 
+            # Новый клиент получает полный снимок популяции: дальше ему
+            # будут приходить только дельты
+            if self._last_population:
+                await websocket.send_text(
+                    orjson.dumps(
+                        {
+                            "type": MessageType.POPULATION_UPDATE.value,
+                            "schema": "1.0.0",
+                            "ts": _now_iso(),
+                            "data": {
+                                "brains": list(self._last_population.values())
+                            },
+                        }
+                    ).decode()
+                )
+
         except Exception as e:
             logger.error(f"[ERROR] Ошибка подключения WebSocket #{client_id}: {e}")
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
+            if client_id in self.active_connections:
+                self.disconnect(websocket)
             try:
                 await websocket.close(code=1011, reason="Internal error")
             except Exception:
@@ -73,21 +303,86 @@ class WebSocketHub:
     def disconnect(self, websocket: WebSocket):
         """Отключение WebSocket клиента."""
         client_id = id(websocket)
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+
+        writer = self._writers.pop(client_id, None)
+        if writer is not None:
+            writer.cancel()
+        self._queues.pop(client_id, None)
+
+        if self.active_connections.pop(client_id, None) is not None:
             logger.info(
-                f"[CONNECT] WebSocket #{client_id} отключен. "
-                f"Всего: {len(self.active_connections)}"
+                "[CONNECT] WebSocket #%d отключен. Всего: %d",
+                client_id,
+                len(self.active_connections),
             )
         else:
-            logger.debug(f"[CONNECT] WebSocket #{client_id} уже отключен")
+            logger.debug("[CONNECT] WebSocket #%d уже отключен", client_id)
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Writer-задача соединения: последовательно выгружает очередь."""
+        try:
+            while True:
+                payload = await queue.get()
+                if isinstance(payload, bytes):
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_text(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(
+                "[WARNING] Ошибка отправки WebSocket #%d: %s", id(websocket), e
+            )
+            self.disconnect(websocket)
+
+    def _enqueue(self, websocket: WebSocket, payload) -> bool:
+        """Кладет payload в очередь соединения.
+
+        Возвращает False при переполнении очереди: клиент не успевает
+        читать и подлежит отключению. Сам disconnect делает вызывающая
+        сторона после обхода, чтобы не мутировать реестр во время
+        итерации — так broadcast обходит dict напрямую без снимка.
+        """
+        queue = self._queues.get(id(websocket))
+        if queue is None:
+            return True
+
+        try:
+            queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            # Клиент не успевает читать — отключаем, чтобы не копить память
+            logger.warning(
+                "[WARNING] Очередь WebSocket #%d переполнена, отключаем",
+                id(websocket),
+            )
+            return False
+
+    def _enqueue_all(self, payload) -> None:
+        """Раскладывает payload по очередям всех соединений.
+
+        Отключения откладываются до конца обхода: на горячем пути нет
+        O(N) копии реестра на каждое событие, аллокация только O(k)
+        списка переполнившихся соединений.
+        """
+        dead: List[WebSocket] = []
+        for ws in self.active_connections.values():
+            if not self._enqueue(ws, payload):
+                dead.append(ws)
+
+        for ws in dead:
+            self.disconnect(ws)
 
     async def send_personal_message(
         self, websocket: WebSocket, message: WebSocketMessage
     ):
         """Отправка личного сообщения клиенту."""
         try:
-            await websocket.send_text(message.json())
+            # orjson сериализует в C заметно быстрее pydantic .json();
+            # кадр остается текстовым ради браузерного клиента
+            await websocket.send_text(
+                orjson.dumps(message.model_dump()).decode()
+            )
         except Exception as e:
             logger.error(f"Ошибка отправки личного сообщения: {e}")
             self.disconnect(websocket)
@@ -97,15 +392,25 @@ class WebSocketHub:
         if not self.active_connections:
             return
 
-        # Создаем копию множества для безопасной итерации
-        connections = self.active_connections.copy()
+        # Сериализуем один раз на broadcast: все соединения получают
+        # один и тот же буфер вместо N повторных кодирований
+        payload = _wire_payload(message.model_dump())
 
-        for connection in connections:
-            try:
-                await connection.send_text(message.json())
-            except Exception as e:
-                logger.error(f"Ошибка broadcast: {e}")
-                self.disconnect(connection)
+        # Только кладем в очереди: фактическую отправку делают
+        # writer-задачи, и медленный клиент не задерживает остальных
+        self._enqueue_all(payload)
+
+    async def broadcast_batch(self, messages: List[WebSocketMessage]):
+        """Отправка пачки сообщений одним кадром всем клиентам.
+
+        Несколько мелких сообщений уходят как один JSON-массив: один
+        кадр и один системный вызов на соединение вместо N.
+        """
+        if not messages or not self.active_connections:
+            return
+
+        payload = _wire_payload([m.model_dump() for m in messages])
+        self._enqueue_all(payload)
 
     async def start_redis_listener(self):
         """Запуск слушателя Redis событий."""
@@ -116,8 +421,20 @@ class WebSocketHub:
             # Подключаемся к Redis
             await redis_adapter.connect()
 
-            # Подписываемся на события
-            success = await redis_adapter.subscribe_to_events(self._handle_redis_event)
+            # Подписываемся на события; в raw-режиме байты из Redis
+            # уходят клиентам без декодирования и повторной сериализации
+            if settings.ws_raw_passthrough:
+                success = await redis_adapter.subscribe_to_events(
+                    None, raw_callback=self._handle_redis_event_raw
+                )
+            else:
+                success = await redis_adapter.subscribe_to_events(
+                    self._handle_redis_event
+                )
+                if success and self._flush_task is None:
+                    self._flush_task = self._create_task(
+                        self._flush_events_loop()
+                    )
             if success:
                 logger.info("[SUCCESS] Redis listener запущен")
             else:
@@ -132,42 +449,155 @@ class WebSocketHub:
             self.redis_callback_task.cancel()
             self.redis_callback_task = None
 
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
         await redis_adapter.disconnect()
         logger.info("Redis listener остановлен")
 
     async def _handle_redis_event(self, event: Dict[str, Any]):
-        """Обработчик событий из Redis."""
+        """Обработчик событий из Redis: кладет событие в окно коалесинга.
+
+        Broadcast делает не каждый вызов, а flush-задача: шторм событий
+        (например, шаг эволюции по всей популяции) уходит клиентам
+        одним пакетным кадром вместо кадра на событие.
+        """
+        self._event_batch.append(event)
+        self._event_batch_ready.set()
+
+    async def _flush_events_loop(self):
+        """Коалесинг событий: копит окно ~10мс и рассылает одним кадром."""
         try:
-            # Создаем WebSocket сообщение
-            message = WebSocketMessage(
-                type=event.get("type", "unknown"),
-                data=event.get("data", {}),
-                ts=datetime.now(),
+            while True:
+                await self._event_batch_ready.wait()
+                # Даем шторму собраться: за окно все события шага
+                # эволюции попадают в один кадр
+                await asyncio.sleep(self._BATCH_WINDOW)
+                batch, self._event_batch = self._event_batch, []
+                self._event_batch_ready.clear()
+
+                try:
+                    frames = []
+                    for event in batch:
+                        frame = self._event_to_frame(event)
+                        if frame is not None:
+                            frames.append(frame)
+
+                    # Кадры — plain dict'ы, кодируются сразу без
+                    # pydantic-модели на каждое событие
+                    # Несколько событий за окно уходят в типизированном
+                    # конверте batch: клиент ветвится по type и
+                    # разворачивает data.events, а не получает голый
+                    # JSON-массив, который стоковый клиент отбросил бы
+                    if frames and self.active_connections:
+                        if len(frames) == 1:
+                            obj = frames[0]
+                        else:
+                            obj = _ws_frame(
+                                MessageType.BATCH, {"events": frames}
+                            )
+                        self._enqueue_all(_wire_payload(obj))
+
+                except Exception as e:
+                    logger.error(f"Ошибка обработки Redis события: {e}")
+
+        except asyncio.CancelledError:
+            logger.debug("[BATCH] Flush-задача остановлена")
+
+    def _event_to_frame(
+        self, event: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Преобразует Redis-событие в кадр WebSocket сообщения."""
+        # Обновления популяции уходят дельтами относительно последнего
+        # разосланного снимка — opt-in, как и остальные изменения
+        # wire-формата: клиент должен понимать population_delta
+        if (
+            event.get("type") == "population_update"
+            and settings.ws_population_deltas
+        ):
+            return self._population_delta_frame(event.get("data", {}))
+
+        # Тип сообщения выбирается словарем; неизвестные события
+        # уходят как system_status с исходным типом в data
+        msg_type = _EVENT_TO_MSGTYPE.get(event.get("type"))
+        if msg_type is None:
+            return _ws_frame(
+                MessageType.SYSTEM_STATUS,
+                {
+                    "event_type": event.get("type"),
+                    "data": event.get("data", {}),
+                },
             )
 
-            # Отправляем всем подключенным клиентам
-            await self.broadcast(message)
+        return _ws_frame(msg_type, event.get("data", {}))
+
+    def _population_delta_frame(
+        self, data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Строит дельту популяции относительно последнего снимка.
+
+        В кадр попадают только изменившиеся мозги и id удаленных: при
+        одной мутации на шаг это на порядок меньше байт и работы на
+        клиенте, чем полный снимок. None — изменений нет, слать нечего.
+        """
+        brains = data.get("brains")
+        if not isinstance(brains, list):
+            # Нет списка мозгов — пересылаем событие как есть
+            return _ws_frame(MessageType.POPULATION_UPDATE, data)
+
+        current = {b.get("id"): b for b in brains}
+        changed = [
+            b
+            for brain_id, b in current.items()
+            if self._last_population.get(brain_id) != b
+        ]
+        removed = [
+            brain_id
+            for brain_id in self._last_population
+            if brain_id not in current
+        ]
+        self._last_population = current
+
+        if not changed and not removed:
+            return None
+
+        return _ws_frame(
+            MessageType.POPULATION_DELTA,
+            {"changed": changed, "removed": removed},
+        )
 
-        except Exception as e:
-            logger.error(f"Ошибка обработки Redis события: {e}")
+    async def _handle_redis_event_raw(self, payload: bytes):
+        """Транзит сырого события из Redis всем клиентам без перекодирования."""
+        if not self.active_connections:
+            return
 
-    async def cleanup_dead_connections(self):
-        """Очистка мертвых WebSocket соединений."""
-        dead_connections = set()
+        self._enqueue_all(_frame_payload(payload))
 
-        for connection in self.active_connections:
-            try:
-                # Проверяем, что соединение еще живо
-                await connection.ping()
-            except Exception:
-                dead_connections.add(connection)
+    async def cleanup_dead_connections(self):
+        """Очистка мертвых WebSocket соединений.
+
+        Живость определяется по состоянию соединения без I/O: проверка
+        client_state мгновенна, тогда как ping-опрос каждого клиента
+        занимал бы сумму RTT и блокировал broadcast'ы на это время.
+        Реально зависшие клиенты и так отваливаются по переполнению
+        своей очереди или по ошибке в writer-задаче.
+        """
+        dead_connections = [
+            connection
+            for connection in self.active_connections.values()
+            if connection.client_state == WebSocketState.DISCONNECTED
+            or connection.application_state == WebSocketState.DISCONNECTED
+        ]
 
         # Удаляем мертвые соединения
         for dead_connection in dead_connections:
             self.disconnect(dead_connection)
 
         if dead_connections:
-            logger.info(f"[CLEANUP] Очищено {len(dead_connections)} мертвых соединений")
+            logger.info(
+                "[CLEANUP] Очищено %d мертвых соединений", len(dead_connections)
+            )
 
     def get_connection_stats(self) -> Dict[str, Any]:
         """Возвращает статистику соединений."""
@@ -2,8 +2,9 @@
 Основной класс для представления когнитивной структуры (мозга).
 """
 
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List
+from typing import Deque, List
 
 import numpy as np
 
@@ -36,6 +37,10 @@ class Brain:
         state: Текущее состояние
     """
 
+    # Потолок истории активаций: кольцевой буфер вместо бесконечного
+    # роста O(шаги × узлы) памяти
+    HISTORY_MAXLEN = 1000
+
     def __init__(self, genome: Genome, growth_rules: GrowthRules):
         self.genome = genome
         self.growth_rules = growth_rules
@@ -43,8 +48,21 @@ class Brain:
         self.gp = 0.0  # Growth Points
         self.fitness = 0.0
         self.age = 0
-        self.state = BrainState(activations=np.zeros(self.phenotype.num_nodes))
-        self.history: List[np.ndarray] = []  # История состояний для анализа
+        # Буфер активаций с запасом: state.activations — срез первых
+        # num_nodes элементов, рост не требует реаллокации каждый раз.
+        # float32: активациям хватает точности, а матвек в
+        # compute_activations упирается в пропускную способность памяти
+        self._act_buf = np.zeros(max(self.phenotype.num_nodes, 1), dtype=np.float32)
+        # Второй буфер для double-buffering шага: compute_activations
+        # пишет в него напрямую, и буферы меняются местами без копии
+        self._next_buf = np.zeros_like(self._act_buf)
+        self.state = BrainState(
+            activations=self._act_buf[: self.phenotype.num_nodes]
+        )
+        # История состояний для анализа: выключена по умолчанию,
+        # т.к. копия активаций на каждый шаг нужна только визуализации
+        self.history_enabled = False
+        self.history: Deque[np.ndarray] = deque(maxlen=self.HISTORY_MAXLEN)
 
     def process_input(self, input_data: np.ndarray) -> np.ndarray:
         """
@@ -67,15 +85,19 @@ class Brain:
 
     def _step(self):
         """Выполняет один шаг обработки."""
-        # Применяем правила активации
-        new_activations = self.phenotype.compute_activations(self.state.activations)
-
-        # Обновляем состояние
-        self.state.activations = new_activations
+        # Применяем правила активации: результат пишется сразу во
+        # второй буфер, после чего буферы меняются местами — ни
+        # аллокации, ни копии результата на шаг
+        out = self._next_buf[: len(self.state.activations)]
+        self.phenotype.compute_activations(self.state.activations, out=out)
+
+        self._act_buf, self._next_buf = self._next_buf, self._act_buf
+        self.state.activations = out
         self.state.step_count += 1
 
-        # Сохраняем историю
-        self.history.append(self.state.activations.copy())
+        # Сохраняем историю только когда она кому-то нужна
+        if self.history_enabled:
+            self.history.append(self.state.activations.copy())
 
         # Проверяем возможность роста
         if self._can_grow():
@@ -107,13 +129,11 @@ class Brain:
         # Создаем новый узел в геноме
         self.genome.add_node()
 
-        # Обновляем фенотип
-        self.phenotype = Phenotype(self.genome)
+        # Обновляем фенотип инкрементально вместо полной перестройки
+        self.phenotype.add_node(self.genome.node_genes[-1])
 
         # Расширяем состояние
-        old_activations = self.state.activations
-        self.state.activations = np.zeros(self.phenotype.num_nodes)
-        self.state.activations[: len(old_activations)] = old_activations
+        self._expand_activations(self.phenotype.num_nodes)
 
         # logger.info(f"Добавлен новый узел: {new_node.id}")
 
@@ -135,24 +155,55 @@ class Brain:
         # logger.info("Добавление соединений временно отключено")
         pass
 
+    def _expand_activations(self, new_size: int):
+        """Расширяет массив активаций с геометрическим запасом.
+
+        Буфер удваивается при исчерпании, поэтому серия рост-событий
+        обходится амортизированно в O(1) копий на добавленный узел
+        вместо реаллокации и полного копирования на каждый рост.
+        """
+        old_size = len(self.state.activations)
+        if new_size > len(self._act_buf):
+            capacity = max(new_size, 2 * len(self._act_buf))
+            new_buf = np.zeros(capacity, dtype=np.float32)
+            new_buf[:old_size] = self.state.activations
+            self._act_buf = new_buf
+            self._next_buf = np.zeros(capacity, dtype=np.float32)
+        self.state.activations = self._act_buf[:new_size]
+        # Хвост буфера мог хранить данные прошлых шагов — новые узлы
+        # должны стартовать с нулевой активации
+        self.state.activations[old_size:] = 0.0
+
     def _update_state_after_splitting(self, old_node, new_nodes):
         """Обновляет состояние после разделения узла."""
         # Копируем активацию старого узла на новые узлы
         old_activation = self.state.activations[old_node.id]
 
-        # Расширяем массив активаций
+        # Расширяем массив активаций (старый префикс сохраняется)
         old_size = len(self.state.activations)
-        new_size = old_size + len(new_nodes) - 1
-        new_activations = np.zeros(new_size)
-
-        # Копируем старые активации
-        new_activations[:old_size] = self.state.activations
+        self._expand_activations(old_size + len(new_nodes) - 1)
 
         # Распределяем активацию старого узла на новые
         for i, new_node in enumerate(new_nodes):
-            new_activations[new_node.id] = old_activation / len(new_nodes)
+            self.state.activations[new_node.id] = old_activation / len(new_nodes)
+
+    def get_thought_path(self) -> List[int]:
+        """Возвращает путь мысли: самый активный узел на каждом шаге.
+
+        Требует включенной истории (history_enabled). Пока мозг не рос,
+        все снимки одной длины и argmax берется одним векторизованным
+        проходом по стопке истории вместо вызова на каждый шаг.
+        """
+        if not self.history:
+            return []
+
+        snapshots = list(self.history)
+        num_nodes = len(snapshots[0])
+        if all(len(s) == num_nodes for s in snapshots):
+            return np.stack(snapshots).argmax(axis=1).tolist()
 
-        self.state.activations = new_activations
+        # После роста снимки разной длины — считаем по одному
+        return [int(np.argmax(s)) for s in snapshots]
 
     def get_fitness(self) -> float:
         """Возвращает текущую приспособленность."""
@@ -180,10 +231,8 @@ class Brain:
 
     def clone(self) -> "Brain":
         """Создает копию мозга."""
-        # Создаем новый экземпляр GrowthRules вместо клонирования
-        cloned_growth_rules = GrowthRules()
         cloned_brain = Brain(
-            genome=self.genome.clone(), growth_rules=cloned_growth_rules
+            genome=self.genome.clone(), growth_rules=self.growth_rules.clone()
         )
         cloned_brain.gp = self.gp
         cloned_brain.fitness = self.fitness
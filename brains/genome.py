@@ -2,9 +2,34 @@
 Генетическая информация мозга.
 """
 
+import copy
 import secrets
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+# Общий генератор для мутаций: bulk-вызовы NumPy вместо тысяч
+# одиночных обращений к RNG на каждый мутируемый геном
+_rng = np.random.default_rng()
+
+# Показатель степенного закона для тяжелохвостой силы мутации (FastGA)
+_POWER_LAW_BETA = 1.5
+
+
+def _sample_power_law_alpha(n_max: int, beta: float = _POWER_LAW_BETA) -> int:
+    """Сэмплирует множитель силы мутации из усечённого степенного закона.
+
+    Обратное преобразование CDF Парето на [1, n_max]: почти все
+    значения близки к 1, но редкие вызовы дают большой множитель и
+    крупный эволюционный прыжок — константная ставка на мультимодальном
+    ландшафте сходится заметно медленнее.
+    """
+    if n_max <= 1:
+        return 1
+    u = _rng.random()
+    alpha = (1.0 - u * (1.0 - n_max ** (1.0 - beta))) ** (1.0 / (1.0 - beta))
+    return min(int(alpha), n_max)
 
 
 @dataclass
@@ -51,10 +76,23 @@ class Genome:
         self.node_genes: List[NodeGene] = []
         self.connection_genes: List[ConnectionGene] = []
 
+        # Индексы для O(1) поиска: проверки существования и выборки
+        # соседей дёргаются из мутаций и фенотипа, линейный проход по
+        # всем генам на каждый вызов не нужен
+        self._node_by_id: Dict[int, NodeGene] = {}
+        self._conn_keys: Set[Tuple[int, int]] = set()
+        self._in_conns: Dict[int, List[ConnectionGene]] = {}
+        self._out_conns: Dict[int, List[ConnectionGene]] = {}
+
         # Счётчики для генерации уникальных ID
         self.next_node_id = 0
         self.next_connection_id = 0
 
+        # Штамп версии структуры: растёт при каждом изменении генов и
+        # позволяет потребителям (Phenotype) кэшировать производные
+        # метрики до следующей мутации
+        self._version = 0
+
         # Инициализируем базовую структуру
         self._initialize_basic_structure()
 
@@ -88,6 +126,7 @@ class Genome:
         """Добавляет новый узел."""
         node_id = self.next_node_id
         self.next_node_id += 1
+        self._version += 1
 
         node = NodeGene(
             id=node_id,
@@ -99,12 +138,14 @@ class Genome:
         )
 
         self.node_genes.append(node)
+        self._node_by_id[node_id] = node
         return node_id
 
     def _add_connection(self, from_node: int, to_node: int) -> int:
         """Добавляет новое соединение."""
         connection_id = self.next_connection_id
         self.next_connection_id += 1
+        self._version += 1
 
         connection = ConnectionGene(
             id=connection_id,
@@ -117,6 +158,9 @@ class Genome:
         )
 
         self.connection_genes.append(connection)
+        self._conn_keys.add((from_node, to_node))
+        self._out_conns.setdefault(from_node, []).append(connection)
+        self._in_conns.setdefault(to_node, []).append(connection)
         return connection_id
 
     def add_node(
@@ -182,48 +226,83 @@ class Genome:
             if conn.from_node == node_id:
                 conn.from_node = new_node2_id
 
+        # Перенаправление меняет топологию само по себе
+        self._version += 1
+
+        # Перенаправления изменили гены на месте — индексы соединений
+        # перестраиваются целиком (разделение узлов — редкая операция)
+        self._rebuild_connection_indexes()
+
         # Соединяем новые узлы
         self._add_connection(new_node1_id, new_node2_id)
 
         return new_node1_id, new_node2_id
 
+    def _rebuild_connection_indexes(self):
+        """Перестраивает индексы соединений по текущему списку генов."""
+        self._conn_keys = {
+            (conn.from_node, conn.to_node) for conn in self.connection_genes
+        }
+        self._in_conns = {}
+        self._out_conns = {}
+        for conn in self.connection_genes:
+            self._out_conns.setdefault(conn.from_node, []).append(conn)
+            self._in_conns.setdefault(conn.to_node, []).append(conn)
+
     def _node_exists(self, node_id: int) -> bool:
         """Проверяет существование узла."""
-        return any(node.id == node_id for node in self.node_genes)
+        return node_id in self._node_by_id
 
     def _connection_exists(self, from_node: int, to_node: int) -> bool:
         """Проверяет существование соединения."""
-        return any(
-            conn.from_node == from_node and conn.to_node == to_node
-            for conn in self.connection_genes
-        )
+        return (from_node, to_node) in self._conn_keys
 
     def mutate(self, mutation_rate: float = 0.1):
         """
         Применяет мутации к геному.
 
         Args:
-            mutation_rate: Вероятность мутации каждого гена
+            mutation_rate: Базовая вероятность мутации каждого гена
         """
-        # Мутации узлов
-        for node in self.node_genes:
-            if secrets.randbelow(1000) / 1000.0 < mutation_rate:
-                node.bias += secrets.randbelow(200) / 1000.0 - 0.1
-                node.threshold += secrets.randbelow(100) / 1000.0 - 0.05
-                node.plasticity += secrets.randbelow(200) / 1000.0 - 0.1
+        # Фактическая ставка тяжелохвостая: базовая умножается на
+        # степенной множитель alpha, общий для всех генов вызова
+        num_nodes = len(self.node_genes)
+        alpha = _sample_power_law_alpha(max(num_nodes // 2, 1))
+        rate = min(mutation_rate * alpha, 1.0)
+
+        # Маски мутаций и все возмущения рисуются одним пакетом на
+        # геном; Python-цикл остаётся только по фактически мутирующим
+        # генам (~rate * N вместо N)
+        if num_nodes:
+            hit = np.flatnonzero(_rng.random(num_nodes) < rate)
+            bias_delta = _rng.uniform(-0.1, 0.1, hit.size)
+            threshold_delta = _rng.uniform(-0.05, 0.05, hit.size)
+            plasticity_delta = _rng.uniform(-0.1, 0.1, hit.size)
+            for k, i in enumerate(hit):
+                node = self.node_genes[i]
+                node.bias += float(bias_delta[k])
+                node.threshold += float(threshold_delta[k])
+                node.plasticity += float(plasticity_delta[k])
 
         # Мутации соединений
-        for conn in self.connection_genes:
-            if secrets.randbelow(1000) / 1000.0 < mutation_rate:
-                conn.weight += secrets.randbelow(400) / 1000.0 - 0.2
-                conn.plasticity += secrets.randbelow(200) / 1000.0 - 0.1
+        num_conns = len(self.connection_genes)
+        if num_conns:
+            hit = np.flatnonzero(_rng.random(num_conns) < rate)
+            weight_delta = _rng.uniform(-0.2, 0.2, hit.size)
+            plasticity_delta = _rng.uniform(-0.1, 0.1, hit.size)
+            for k, i in enumerate(hit):
+                conn = self.connection_genes[i]
+                conn.weight += float(weight_delta[k])
+                conn.plasticity += float(plasticity_delta[k])
 
         # Случайные структурные мутации
         if (
-            secrets.randbelow(1000) / 1000.0 < mutation_rate * 0.5
+            _rng.random() < mutation_rate * 0.5
         ):  # Увеличиваем вероятность структурных мутаций
             self._structural_mutation()
 
+        self._version += 1
+
     def _structural_mutation(self):
         """Выполняет структурную мутацию."""
         mutation_type = secrets.choice(
@@ -245,32 +324,57 @@ class Genome:
             # Удаляем случайное соединение
             conn_to_remove = secrets.choice(self.connection_genes)
             self.connection_genes.remove(conn_to_remove)
+            self._out_conns[conn_to_remove.from_node].remove(conn_to_remove)
+            self._in_conns[conn_to_remove.to_node].remove(conn_to_remove)
+            key = (conn_to_remove.from_node, conn_to_remove.to_node)
+            # Пара могла дублироваться после split_node — ключ уходит
+            # только вместе с последним соединением этой пары
+            if not any(
+                conn.to_node == key[1] for conn in self._out_conns[key[0]]
+            ):
+                self._conn_keys.discard(key)
+            self._version += 1
 
     def clone(self) -> "Genome":
-        """Создаёт копию генома."""
-        new_genome = Genome(self.input_size, self.output_size, self.hidden_size)
-        new_genome.node_genes = [NodeGene(**vars(node)) for node in self.node_genes]
+        """Создаёт копию генома.
+
+        Обходит __init__: тот генерирует полную случайную структуру
+        (десятки обращений к secrets), которую clone тут же выбрасывал,
+        перезаписывая гены копиями родительских. Гены копируются
+        по-настоящему, а не разделяются: скрещивание и мутации пишут
+        в объекты генов напрямую.
+        """
+        new_genome = Genome.__new__(Genome)
+        new_genome.input_size = self.input_size
+        new_genome.output_size = self.output_size
+        new_genome.hidden_size = self.hidden_size
+        new_genome.node_genes = [copy.copy(node) for node in self.node_genes]
         new_genome.connection_genes = [
-            ConnectionGene(**vars(conn)) for conn in self.connection_genes
+            copy.copy(conn) for conn in self.connection_genes
         ]
         new_genome.next_node_id = self.next_node_id
         new_genome.next_connection_id = self.next_connection_id
+        new_genome._version = self._version
+        new_genome._node_by_id = {
+            node.id: node for node in new_genome.node_genes
+        }
+        new_genome._rebuild_connection_indexes()
         return new_genome
 
     def get_node_by_id(self, node_id: int) -> NodeGene:
         """Возвращает узел по ID."""
-        for node in self.node_genes:
-            if node.id == node_id:
-                return node
-        raise ValueError(f"Узел {node_id} не найден")
+        node = self._node_by_id.get(node_id)
+        if node is None:
+            raise ValueError(f"Узел {node_id} не найден")
+        return node
 
     def get_connections_to(self, node_id: int) -> List[ConnectionGene]:
         """Возвращает все входящие соединения для узла."""
-        return [conn for conn in self.connection_genes if conn.to_node == node_id]
+        return list(self._in_conns.get(node_id, ()))
 
     def get_connections_from(self, node_id: int) -> List[ConnectionGene]:
         """Возвращает все исходящие соединения для узла."""
-        return [conn for conn in self.connection_genes if conn.from_node == node_id]
+        return list(self._out_conns.get(node_id, ()))
 
     def __repr__(self):
         return (
@@ -2,7 +2,8 @@
 Правила роста и развития мозга.
 """
 
-import secrets
+import copy
+import random  # nosec B311 - используется для стохастики роста, не для криптографии
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
@@ -77,26 +78,14 @@ class GrowthRules:
         if not available_rules:
             return None
 
-        # Выбираем правило на основе вероятностей
-        total_probability = sum(rule.probability for rule in available_rules)
-        if total_probability == 0:
+        # Выбираем правило на основе вероятностей: взвешенный выбор
+        # одним вызовом вместо ручной нормализации и кумулятивного цикла
+        weights = [rule.probability for rule in available_rules]
+        if sum(weights) == 0:
             return None
 
-        # Нормализуем вероятности
-        normalized_rules = []
-        cumulative_prob = 0.0
-
-        for rule in available_rules:
-            cumulative_prob += rule.probability / total_probability
-            normalized_rules.append((rule, cumulative_prob))
-
-        # Выбираем правило
-        rand_val = secrets.randbelow(int(total_probability * 1000000)) / 1000000.0
-        for rule, prob in normalized_rules:
-            if rand_val <= prob:
-                return rule.name
-
-        return available_rules[-1].name
+        chosen = random.choices(available_rules, weights=weights)[0]  # nosec B311
+        return chosen.name
 
     def _can_grow(self, brain) -> bool:
         """
@@ -115,12 +104,14 @@ class GrowthRules:
         if brain.phenotype.num_nodes >= self.max_nodes:
             return False
 
-        # Проверяем сложность
-        if self._get_complexity_score(brain) > 0.8:
+        # Случайная проверка для предотвращения слишком частого роста:
+        # идёт раньше оценки сложности, чтобы дорогой анализ путей не
+        # выполнялся на тиках, где рост всё равно не состоится
+        if random.random() >= self.growth_probability:  # nosec B311
             return False
 
-        # Случайная проверка для предотвращения слишком частого роста
-        return secrets.randbelow(1000000) / 1000000.0 < self.growth_probability
+        # Проверяем сложность
+        return self._get_complexity_score(brain) <= 0.8
 
     def _get_complexity_score(self, brain) -> float:
         """
@@ -293,6 +284,21 @@ class GrowthRules:
             "optimal_growth": self.optimize_growth_strategy(brain),
         }
 
+    def clone(self) -> "GrowthRules":
+        """Создаёт копию правил роста.
+
+        Обходит __init__ и копирует правила поверхностно: скрещивание
+        пишет параметры напрямую, поэтому объекты правил не разделяются.
+        """
+        new_rules = GrowthRules.__new__(GrowthRules)
+        new_rules.growth_rules = [copy.copy(rule) for rule in self.growth_rules]
+        new_rules.max_nodes = self.max_nodes
+        new_rules.max_connections = self.max_connections
+        new_rules.growth_cost = self.growth_cost
+        new_rules.growth_probability = self.growth_probability
+        new_rules.complexity_penalty = self.complexity_penalty
+        return new_rules
+
     def __repr__(self):
         return (
             f"GrowthRules(rules={len(self.growth_rules)}, "
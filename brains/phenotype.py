@@ -2,12 +2,77 @@
 Фенотипическое представление мозга.
 """
 
-from typing import Dict, List
+import math
+from typing import Dict, List, Optional
 
 import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+try:
+    import numba
+except ImportError:
+    # numba опционален: без него работает обычный NumPy-путь
+    numba = None
 
 from .genome import Genome
 
+# Коды узлов для JIT-ядра: 0 — входной (значение проходит как есть),
+# дальше — функция активации
+_KIND_INPUT = 0
+_KIND_SIGMOID = 1
+_KIND_TANH = 2
+_KIND_RELU = 3
+_KIND_LINEAR = 4
+
+_ACTIVATION_KINDS = {
+    "sigmoid": _KIND_SIGMOID,
+    "tanh": _KIND_TANH,
+    "relu": _KIND_RELU,
+    "linear": _KIND_LINEAR,
+}
+
+# Пустой индексный массив для отсутствующих типов узлов
+_EMPTY_IDX = np.empty(0, dtype=np.intp)
+
+
+if numba is not None:
+
+    @numba.njit(cache=True, fastmath=True)
+    def _forward(weights, bias, kinds, thresholds, a_in, a_out):
+        """Слитый шаг: матвек + активация + порог одним проходом.
+
+        Для маленьких мозгов накладные расходы NumPy-диспетчеризации
+        превышают полезную работу; один скомпилированный цикл убирает
+        их и позволяет LLVM векторизовать строки весов.
+        """
+        n = a_in.shape[0]
+        for i in range(n):
+            kind = kinds[i]
+            if kind == _KIND_INPUT:
+                a_out[i] = a_in[i]
+                continue
+
+            s = bias[i]
+            for j in range(n):
+                s += weights[j, i] * a_in[j]
+
+            if kind == _KIND_SIGMOID:
+                value = 1.0 / (1.0 + math.exp(-min(max(s, -500.0), 500.0)))
+            elif kind == _KIND_TANH:
+                value = math.tanh(s)
+            elif kind == _KIND_RELU:
+                value = s if s > 0.0 else 0.0
+            else:
+                value = s
+
+            if value < thresholds[i]:
+                value = 0.0
+            a_out[i] = value
+
+else:
+    _forward = None
+
 
 class Phenotype:
     """
@@ -23,6 +88,18 @@ class Phenotype:
         self.genome = genome
         self.num_nodes = len(genome.node_genes)
 
+        # Ёмкость матриц с запасом: добавление узла при свободной
+        # ёмкости не требует перестройки (см. add_node)
+        self._capacity = self.num_nodes
+
+        # Кэш структурных метрик (плотность, средняя длина пути):
+        # они зависят только от топологии и пересчитываются лишь когда
+        # штамп версии генома уходит вперёд
+        self._density_version = -1
+        self._cached_density = 0.0
+        self._path_version = -1
+        self._cached_avg_path = 0.0
+
         # Создаём матрицы для быстрых вычислений
         self._build_matrices()
 
@@ -36,67 +113,205 @@ class Phenotype:
 
     def _build_matrices(self):
         """Строит матрицы для быстрых вычислений."""
+        cap = max(self._capacity, self.num_nodes)
+        self._capacity = cap
+        n = self.num_nodes
+
+        # Буферы выделяются с запасом по ёмкости, рабочие матрицы —
+        # срезы первых num_nodes элементов
+        self._weight_buf = np.zeros((cap, cap), dtype=np.float32)
+        self._bias_buf = np.zeros(cap, dtype=np.float32)
+        self._threshold_buf = np.zeros(cap, dtype=np.float32)
+        self._plasticity_buf = np.zeros(cap, dtype=np.float32)
+        self._kind_buf = np.zeros(cap, dtype=np.int8)
+
         # Матрица весов (num_nodes x num_nodes)
-        self.weight_matrix = np.zeros((self.num_nodes, self.num_nodes))
+        self.weight_matrix = self._weight_buf[:n, :n]
 
         # Вектор смещений
-        self.bias_vector = np.zeros(self.num_nodes)
+        self.bias_vector = self._bias_buf[:n]
 
         # Вектор порогов
-        self.threshold_vector = np.zeros(self.num_nodes)
+        self.threshold_vector = self._threshold_buf[:n]
 
         # Вектор пластичности
-        self.plasticity_vector = np.zeros(self.num_nodes)
+        self.plasticity_vector = self._plasticity_buf[:n]
+
+        # Коды узлов для JIT-ядра
+        self.kind_vector = self._kind_buf[:n]
+
+        # Знаки соединений (1 для возбуждающих, -1 для тормозных):
+        # разреженный словарь вместо плотной N x N матрицы, которую
+        # читал только get_connection_strength
+        self._connection_signs: Dict[tuple, float] = {}
+
+        # Заполняем матрицы из генома: поля генов собираются в SoA
+        # массивы и пишутся одним fancy-index присваиванием вместо
+        # поэлементного Python-цикла по узлам и связям
+        nodes = self.genome.node_genes
+        count = len(nodes)
+        if count:
+            ids = np.fromiter((nd.id for nd in nodes), np.intp, count)
+            self.bias_vector[ids] = np.fromiter(
+                (nd.bias for nd in nodes), np.float32, count
+            )
+            self.threshold_vector[ids] = np.fromiter(
+                (nd.threshold for nd in nodes), np.float32, count
+            )
+            self.plasticity_vector[ids] = np.fromiter(
+                (nd.plasticity for nd in nodes), np.float32, count
+            )
+            self.kind_vector[ids] = np.fromiter(
+                (self._node_kind(nd) for nd in nodes), np.int8, count
+            )
+
+        enabled = [conn for conn in self.genome.connection_genes if conn.enabled]
+        count = len(enabled)
+        if count:
+            from_ids = np.fromiter(
+                (conn.from_node for conn in enabled), np.intp, count
+            )
+            to_ids = np.fromiter(
+                (conn.to_node for conn in enabled), np.intp, count
+            )
+            self.weight_matrix[from_ids, to_ids] = np.fromiter(
+                (conn.weight for conn in enabled), np.float32, count
+            )
+            self._connection_signs = {
+                (conn.from_node, conn.to_node): (
+                    1.0 if conn.connection_type == "excitatory" else -1.0
+                )
+                for conn in enabled
+            }
 
-        # Матрица типов соединений (1 для возбуждающих, -1 для тормозных)
-        self.connection_type_matrix = np.zeros((self.num_nodes, self.num_nodes))
+        self._refresh_kind_indexes()
+        self._refresh_type_indexes()
 
-        # Заполняем матрицы из генома
-        for node in self.genome.node_genes:
-            self.bias_vector[node.id] = node.bias
-            self.threshold_vector[node.id] = node.threshold
-            self.plasticity_vector[node.id] = node.plasticity
+    def _refresh_type_indexes(self):
+        """Группирует позиции узлов по типу в индексные массивы.
 
-        for conn in self.genome.connection_genes:
-            if conn.enabled:
-                self.weight_matrix[conn.from_node, conn.to_node] = conn.weight
-                self.connection_type_matrix[conn.from_node, conn.to_node] = (
-                    1.0 if conn.connection_type == "excitatory" else -1.0
-                )
+        Выборки вида get_output_nodes и срез выходных активаций на
+        каждом тике читают готовый массив вместо прохода по всем генам.
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, node in enumerate(self.genome.node_genes):
+            groups.setdefault(node.node_type, []).append(i)
+        self._type_indexes = {
+            node_type: np.asarray(ids, dtype=np.intp)
+            for node_type, ids in groups.items()
+        }
+
+    def _refresh_kind_indexes(self):
+        """Группирует узлы по коду активации в индексные массивы.
 
-    def compute_activations(self, current_activations: np.ndarray) -> np.ndarray:
+        Векторный путь без Numba применяет каждую функцию активации к
+        своей группе одним NumPy-вызовом вместо Python-диспетчеризации
+        на каждый узел.
+        """
+        kinds = self.kind_vector
+        self._input_idx = np.flatnonzero(kinds == _KIND_INPUT)
+        self._sigmoid_idx = np.flatnonzero(kinds == _KIND_SIGMOID)
+        self._tanh_idx = np.flatnonzero(kinds == _KIND_TANH)
+        self._relu_idx = np.flatnonzero(kinds == _KIND_RELU)
+        self._linear_idx = np.flatnonzero(kinds == _KIND_LINEAR)
+        self._noninput_idx = np.flatnonzero(kinds != _KIND_INPUT)
+
+    def add_node(self, node) -> None:
+        """Инкрементально добавляет узел без полной перестройки матриц.
+
+        При свободной ёмкости буферов достаточно расширить срезы и
+        записать параметры нового узла — O(1) вместо O(узлы + связи).
+        При исчерпании ёмкость удваивается, так что последовательный
+        рост остается амортизированно дешевым.
+        """
+        new_size = self.num_nodes + 1
+        if new_size > self._capacity:
+            self._capacity = max(new_size, self._capacity * 2)
+            self.num_nodes = new_size
+            self._build_matrices()
+            return
+
+        self.num_nodes = new_size
+        n = new_size
+        self.weight_matrix = self._weight_buf[:n, :n]
+        self.bias_vector = self._bias_buf[:n]
+        self.threshold_vector = self._threshold_buf[:n]
+        self.plasticity_vector = self._plasticity_buf[:n]
+        self.kind_vector = self._kind_buf[:n]
+
+        self.bias_vector[node.id] = node.bias
+        self.threshold_vector[node.id] = node.threshold
+        self.plasticity_vector[node.id] = node.plasticity
+        self.kind_vector[node.id] = self._node_kind(node)
+        self._refresh_kind_indexes()
+        self._refresh_type_indexes()
+
+    @staticmethod
+    def _node_kind(node) -> int:
+        """Код узла для JIT-ядра (входной или функция активации)."""
+        if node.node_type == "input":
+            return _KIND_INPUT
+        return _ACTIVATION_KINDS.get(node.activation_function, _KIND_SIGMOID)
+
+    def compute_activations(
+        self, current_activations: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
         Вычисляет новые активации на основе текущих.
 
         Args:
             current_activations: Текущие активации узлов
+            out: Буфер для результата; без него выделяется новый массив
 
         Returns:
             Новые активации узлов
         """
+        # JIT-путь: матвек, активация и порог одним слитым циклом
+        if _forward is not None:
+            if out is None:
+                out = np.zeros_like(current_activations)
+            _forward(
+                self.weight_matrix,
+                self.bias_vector,
+                self.kind_vector,
+                self.threshold_vector,
+                current_activations,
+                out,
+            )
+            return out
+
         # Вычисляем взвешенную сумму входов
         weighted_inputs = np.dot(self.weight_matrix.T, current_activations)
 
         # Применяем смещения
         net_inputs = weighted_inputs + self.bias_vector
 
-        # Применяем функции активации
-        new_activations = np.zeros_like(current_activations)
-
-        for i, node in enumerate(self.genome.node_genes):
-            if node.node_type == "input":
-                # Входные узлы сохраняют свои значения
-                new_activations[i] = current_activations[i]
-            else:
-                # Применяем функцию активации
-                activation_func = self._activation_functions.get(
-                    node.activation_function, self._sigmoid
-                )
-                new_activations[i] = activation_func(net_inputs[i])
+        # Применяем функции активации по группам узлов: четыре
+        # NumPy-вызова вместо Python-диспетчеризации на каждый узел
+        new_activations = (
+            out if out is not None else np.zeros_like(current_activations)
+        )
 
-                # Применяем порог
-                if new_activations[i] < node.threshold:
-                    new_activations[i] = 0.0
+        idx = self._sigmoid_idx
+        new_activations[idx] = 1.0 / (
+            1.0 + np.exp(-np.clip(net_inputs[idx], -500, 500))
+        )
+        idx = self._tanh_idx
+        new_activations[idx] = np.tanh(net_inputs[idx])
+        idx = self._relu_idx
+        new_activations[idx] = np.maximum(net_inputs[idx], 0.0)
+        idx = self._linear_idx
+        new_activations[idx] = net_inputs[idx]
+
+        # Порог обнуляет слабые активации (кроме входных узлов)
+        idx = self._noninput_idx
+        values = new_activations[idx]
+        values[values < self.threshold_vector[idx]] = 0.0
+        new_activations[idx] = values
+
+        # Входные узлы сохраняют свои значения
+        idx = self._input_idx
+        new_activations[idx] = current_activations[idx]
 
         return new_activations
 
@@ -110,44 +325,23 @@ class Phenotype:
         Returns:
             Активации выходных узлов
         """
-        output_nodes = [
-            i
-            for i, node in enumerate(self.genome.node_genes)
-            if node.node_type == "output"
-        ]
-        return activations[output_nodes]
+        return activations[self._type_indexes.get("output", _EMPTY_IDX)]
 
     def get_input_nodes(self) -> List[int]:
         """Возвращает список ID входных узлов."""
-        return [
-            i
-            for i, node in enumerate(self.genome.node_genes)
-            if node.node_type == "input"
-        ]
+        return self._type_indexes.get("input", _EMPTY_IDX).tolist()
 
     def get_output_nodes(self) -> List[int]:
         """Возвращает список ID выходных узлов."""
-        return [
-            i
-            for i, node in enumerate(self.genome.node_genes)
-            if node.node_type == "output"
-        ]
+        return self._type_indexes.get("output", _EMPTY_IDX).tolist()
 
     def get_hidden_nodes(self) -> List[int]:
         """Возвращает список ID скрытых узлов."""
-        return [
-            i
-            for i, node in enumerate(self.genome.node_genes)
-            if node.node_type == "hidden"
-        ]
+        return self._type_indexes.get("hidden", _EMPTY_IDX).tolist()
 
     def get_memory_nodes(self) -> List[int]:
         """Возвращает список ID узлов памяти."""
-        return [
-            i
-            for i, node in enumerate(self.genome.node_genes)
-            if node.node_type == "memory"
-        ]
+        return self._type_indexes.get("memory", _EMPTY_IDX).tolist()
 
     def get_node_connections(self, node_id: int) -> Dict[str, List[int]]:
         """
@@ -183,8 +377,8 @@ class Phenotype:
             Сила соединения (вес * тип)
         """
         weight = self.weight_matrix[from_node, to_node]
-        conn_type = self.connection_type_matrix[from_node, to_node]
-        return weight * conn_type
+        sign = self._connection_signs.get((from_node, to_node), 0.0)
+        return weight * sign
 
     def get_network_density(self) -> float:
         """
@@ -194,11 +388,19 @@ class Phenotype:
         Returns:
             Плотность сети (0.0 - 1.0)
         """
+        if self._density_version == self.genome._version:
+            return self._cached_density
+
         max_connections = self.num_nodes * (self.num_nodes - 1)
         actual_connections = sum(
             1 for conn in self.genome.connection_genes if conn.enabled
         )
-        return actual_connections / max_connections if max_connections > 0 else 0.0
+        density = (
+            actual_connections / max_connections if max_connections > 0 else 0.0
+        )
+        self._cached_density = density
+        self._density_version = self.genome._version
+        return density
 
     def get_average_path_length(self) -> float:
         """
@@ -207,40 +409,46 @@ class Phenotype:
         Returns:
             Средняя длина пути
         """
+        # Полный APSP дорог, а проверка роста дёргает метрику на каждом
+        # шаге — кэшируем результат до следующей мутации генома
+        if self._path_version == self.genome._version:
+            return self._cached_avg_path
+
         # Простая реализация через матрицу достижимости
         reachability = self._compute_reachability_matrix()
 
-        total_length = 0
-        path_count = 0
-
-        for i in range(self.num_nodes):
-            for j in range(self.num_nodes):
-                if i != j and reachability[i, j] > 0:
-                    total_length += reachability[i, j]
-                    path_count += 1
-
-        return total_length / path_count if path_count > 0 else 0.0
+        # Среднее по достижимым парам одним векторизованным проходом
+        lengths = reachability[reachability > 0]
+        avg_path = float(lengths.mean()) if lengths.size else 0.0
+        self._cached_avg_path = avg_path
+        self._path_version = self.genome._version
+        return avg_path
 
     def _compute_reachability_matrix(self) -> np.ndarray:
-        """Вычисляет матрицу достижимости (минимальные расстояния между узлами)."""
-        # Инициализируем матрицу расстояний
-        distances = np.full((self.num_nodes, self.num_nodes), np.inf)
-        np.fill_diagonal(distances, 0)
+        """Вычисляет матрицу достижимости (минимальные расстояния между узлами).
 
-        # Заполняем прямые соединения
-        for conn in self.genome.connection_genes:
-            if conn.enabled:
-                distances[conn.from_node, conn.to_node] = 1
+        Кратчайшие пути считает scipy.sparse.csgraph по CSR-смежности:
+        компилированный BFS вместо тройного Python-цикла
+        Флойда-Уоршелла, который был O(N^3) на каждую оценку сложности.
+        """
+        n = self.num_nodes
+        enabled = [conn for conn in self.genome.connection_genes if conn.enabled]
+        if n == 0 or not enabled:
+            return np.zeros((n, n))
+
+        count = len(enabled)
+        from_ids = np.fromiter((c.from_node for c in enabled), np.intp, count)
+        to_ids = np.fromiter((c.to_node for c in enabled), np.intp, count)
+        adjacency = csr_matrix(
+            (np.ones(count), (from_ids, to_ids)), shape=(n, n)
+        )
 
-        # Алгоритм Флойда-Уоршелла для кратчайших путей
-        for k in range(self.num_nodes):
-            for i in range(self.num_nodes):
-                for j in range(self.num_nodes):
-                    if distances[i, k] + distances[k, j] < distances[i, j]:
-                        distances[i, j] = distances[i, k] + distances[k, j]
+        distances = shortest_path(
+            adjacency, method="D", unweighted=True, directed=True
+        )
 
         # Заменяем inf на 0 для недостижимых узлов
-        distances[distances == np.inf] = 0
+        distances[np.isinf(distances)] = 0
 
         return distances
 
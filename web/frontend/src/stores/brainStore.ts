@@ -175,12 +175,26 @@ export const useBrainStore = create<BrainStore>((set, get) => ({
 
     // Обрабатываем разные типы сообщений
     switch (message.type) {
+      case 'batch':
+        console.log('📦 Пачка событий через WebSocket');
+        // Разворачиваем конверт и обрабатываем события по одному
+        (message.data?.events ?? []).forEach((event: WebSocketMessage) =>
+          get().handleWebSocketMessage(event),
+        );
+        break;
+
       case 'population_update':
         console.log('🔄 Обновление популяции через WebSocket');
         // Автоматически обновляем данные
         get().fetchPopulation();
         break;
 
+      case 'population_delta':
+        console.log('🔄 Дельта популяции через WebSocket');
+        // Дельта сигнализирует об изменениях — перезапрашиваем данные
+        get().fetchPopulation();
+        break;
+
       case 'brain_update':
         console.log('🧠 Обновление мозга через WebSocket');
         // Можно обновить конкретный мозг